@@ -0,0 +1,85 @@
+''' End-to-end crawl against the local stand-in cache server.
+
+Runs launch.py --restart in a scratch directory for each engine, with the
+cache server from benchmarks/cache_server.py serving a generated site (or a
+recorded --corpus), and reports pages/sec, CPU seconds and peak RSS of the
+crawler process, its parse processes included.
+
+    python -m benchmarks.bench_crawl [--engines thread,async] [--threads T]
+        [--politeness S] [--pages N] [--latency S] [--error_rate F] ...
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from benchmarks.cache_server import add_arguments, from_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_config(base_config, path, threads, politeness, parse_processes):
+    cparser = ConfigParser()
+    cparser.read(base_config)
+    cparser["CRAWLER"]["POLITENESS"] = str(politeness)
+    cparser["LOCAL PROPERTIES"]["THREADCOUNT"] = str(threads)
+    cparser["LOCAL PROPERTIES"]["PARSEPROCESSES"] = str(parse_processes)
+    cparser["LOCAL PROPERTIES"]["SAVE"] = "frontier.shelve"
+    with open(path, "w") as f:
+        cparser.write(f)
+
+
+def crawl(engine, server, base_config, threads, politeness, parse_processes):
+    ''' (pages/sec, cpu seconds, peak rss MiB, pages served, errors served)
+    of one crawl, None if the crawler failed. '''
+    host, port = server.address
+    served, errors = server.served, server.errors
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = os.path.join(tmp, "config.ini")
+        write_config(base_config, config_file, threads, politeness, parse_processes)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "launch.py"), "--restart",
+             "--config_file", config_file, "--engine", engine,
+             "--cache_server", f"{host}:{port}"],
+            cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        return None
+    pages = server.served - served
+    cpu = usage.ru_utime + usage.ru_stime
+    # ru_maxrss is in KiB on Linux, bytes on macOS.
+    rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return pages / elapsed, cpu, rss, pages, server.errors - errors
+
+
+def main(args):
+    server = from_arguments(args).start()
+    print(f"Serving {len(server.pages)} pages at {server.address[0]}:{server.address[1]}")
+    for engine in args.engines.split(","):
+        result = crawl(
+            engine, server, args.config_file, args.threads, args.politeness,
+            args.parse_processes)
+        if result is None:
+            print(f"{engine:<8} crawler failed, run launch.py --engine {engine} to see why")
+            continue
+        rate, cpu, rss, pages, errors = result
+        print(f"{engine:<8} {pages:7d} pages {errors:5d} 6xx {rate:8.1f} pages/s "
+              f"{cpu:7.1f} s cpu {rss:7.1f} MiB peak rss")
+    server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--engines", type=str, default="thread")
+    parser.add_argument("--config_file", type=str, default=os.path.join(ROOT, "config.ini"))
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    parser.add_argument("--parse_processes", type=int, default=0)
+    add_arguments(parser)
+    main(parser.parse_args())
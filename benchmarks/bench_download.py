@@ -0,0 +1,77 @@
+''' Per-request latency of utils.download against a local stand-in server,
+with a fresh connection per request versus the pooled keep-alive session.
+
+    python -m benchmarks.bench_download [--requests N] [--threads T]
+'''
+import pickle
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+import requests
+
+from utils.download import download
+from utils.response import Response
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, every
+    # keep-alive request after the first stalls on the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = parse_qs(urlparse(self.path).query)["q"][0]
+        body = cbor.dumps({"url": url, "status": 200, "response": pickle.dumps(None)})
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def download_unpooled(url, config, logger=None):
+    ''' utils.download before pooling: a new connection per request. '''
+    host, port = config.cache_server
+    resp = requests.get(
+        f"http://{host}:{port}/",
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    return Response(cbor.loads(resp.content))
+
+
+def run(fetch, config, count, threads):
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(count)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda url: fetch(url, config), urls))
+    elapsed = time.perf_counter() - start
+    return count / elapsed, elapsed / count * threads * 1000
+
+
+def main(count, threads):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CacheHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    config = SimpleNamespace(
+        cache_server=server.server_address, user_agent="IR benchmark",
+        threads_count=threads, connect_timeout=5, read_timeout=30, fetch_deadline=60,
+        retries=3, backoff=0.5)
+    for name, fetch in (("requests.get", download_unpooled),
+                        ("pooled session", download)):
+        rate, latency = run(fetch, config, count, threads)
+        print(f"{name:<16} {rate:8.0f} req/s {latency:8.2f} ms/req")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    main(args.requests, args.threads)
@@ -0,0 +1,62 @@
+''' Pages/sec of the streaming lxml extractor against the BeautifulSoup path
+over a corpus of saved pages (the crawl's JSON files with a "content" field,
+or plain .html files). Without --corpus a synthetic corpus is used.
+
+    python -m benchmarks.bench_extract [--corpus DIR]
+'''
+import json
+import os
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import scraper
+
+
+def load_corpus(folder):
+    pages = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(".json"):
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                pages.append((data.get("url", path), data.get("content", "").encode("utf-8")))
+            elif name.endswith((".html", ".htm")):
+                with open(path, "rb") as f:
+                    pages.append((path, f.read()))
+    return pages
+
+
+def synthetic_corpus(count):
+    body = "".join(
+        f"<p>Paragraph {i} about research in computing and statistics.</p>"
+        f"<a href='/people/{i}#bio'>Person {i}</a>" for i in range(300))
+    page = f"<html><head><script>var x = 1;</script></head><body>{body}</body></html>"
+    return [(f"https://www.ics.uci.edu/page/{i}", page.encode("utf-8")) for i in range(count)]
+
+
+def run(name, parse, pages):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for url, content in pages:
+        parse(url, content)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<14} {len(pages) / elapsed:8.1f} pages/s  peak {peak / 2 ** 20:6.1f} MiB")
+
+
+def main(corpus):
+    pages = load_corpus(corpus) if corpus else synthetic_corpus(200)
+    print(f"{len(pages)} pages")
+    run("BeautifulSoup", scraper.parse_page_soup, pages)
+    run("lxml stream", lambda url, content: scraper.extract_links_and_tokens(
+        url, content, scraper.stop_words), pages)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    args = parser.parse_args()
+    main(args.corpus)
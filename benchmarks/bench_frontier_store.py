@@ -0,0 +1,64 @@
+''' Compare urls/sec added to the frontier store.
+
+The sync-per-url baseline slows down as the shelve grows (dbm.dumb rewrites
+its whole index on every sync), so the default size is kept small.
+
+    python -m benchmarks.bench_frontier_store [--urls N]
+'''
+import os
+import shelve
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from crawler.store import ShelveBackend, WriteBehindStore
+from utils import get_urlhash
+
+
+def make_urls(count):
+    return [f"https://www.ics.uci.edu/page/{i}" for i in range(count)]
+
+
+def bench_shelve_sync(path, urls):
+    ''' What the frontier used to do: one sync per url. '''
+    save = shelve.open(path)
+    start = time.perf_counter()
+    for url in urls:
+        urlhash = get_urlhash(url)
+        if urlhash not in save:
+            save[urlhash] = (url, False)
+            save.sync()
+    elapsed = time.perf_counter() - start
+    save.close()
+    return elapsed
+
+
+def bench_write_behind(path, urls, batch_size):
+    save = WriteBehindStore(ShelveBackend(path), batch_size=batch_size)
+    start = time.perf_counter()
+    for url in urls:
+        urlhash = get_urlhash(url)
+        if urlhash not in save:
+            save[urlhash] = (url, False)
+    save.flush()
+    elapsed = time.perf_counter() - start
+    save.close()
+    return elapsed
+
+
+def main(count, batch_size):
+    urls = make_urls(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed = bench_shelve_sync(os.path.join(tmp, "sync.shelve"), urls)
+        print(f"shelve + sync per url: {count / elapsed:10.0f} urls/sec")
+        elapsed = bench_write_behind(
+            os.path.join(tmp, "batched.shelve"), urls, batch_size)
+        print(f"write-behind (batch {batch_size}): {count / elapsed:10.0f} urls/sec")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    main(args.urls, args.batch)
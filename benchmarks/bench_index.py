@@ -0,0 +1,97 @@
+''' Docs/sec and peak RSS of the SPIMI index builder against the in-memory
+dict build_inverted_index used to return, over a generated corpus of crawled
+JSON pages (or a recorded --corpus). Each build runs in its own process so
+its peak RSS, pool processes included, is measured alone.
+
+    python -m benchmarks.bench_index [--pages N] [--corpus DIR]
+        [--processes P] [--memory_mb MB]
+'''
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+
+from benchmarks.cache_server import synthetic_corpus
+
+
+def legacy_build_inverted_index(file_paths):
+    ''' scraper.build_inverted_index before it wrote an on-disk index. '''
+    from scraper import parse_file_and_tokenize
+    inverted_index = defaultdict(list)
+    for file_path in file_paths:
+        tokens = parse_file_and_tokenize(file_path)
+        term_freq = defaultdict(int)
+        for token in tokens:
+            term_freq[token] += 1
+        for token, tf in term_freq.items():
+            inverted_index[token].append({'doc_id': file_path, 'tf': tf})
+    return inverted_index
+
+
+def write_corpus(directory, pages, words):
+    for i, (url, html) in enumerate(synthetic_corpus(pages, words=words).items()):
+        with open(os.path.join(directory, f"{i}.json"), "w") as f:
+            json.dump({"url": url, "content": html, "encoding": "utf-8"}, f)
+
+
+def build(builder, corpus, index_dir, processes, memory_mb):
+    ''' Runs in the child process. '''
+    from scraper import get_all_file_paths, build_inverted_index
+    paths = get_all_file_paths(corpus)
+    start = time.perf_counter()
+    if builder == "legacy":
+        legacy_build_inverted_index(paths)
+    else:
+        build_inverted_index(paths, index_dir, processes, memory_mb)
+    print(len(paths) / (time.perf_counter() - start))
+
+
+def measure(builder, corpus, index_dir, processes, memory_mb):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_index", "--run", builder,
+         "--corpus", corpus, "--index_dir", index_dir,
+         "--processes", str(processes), "--memory_mb", str(memory_mb)],
+        stdout=subprocess.PIPE, text=True)
+    output = process.stdout.read()
+    _, _, usage = os.wait4(process.pid, 0)
+    rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return float(output), rss
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(tmp, "corpus")
+            os.makedirs(corpus)
+            write_corpus(corpus, args.pages, args.words)
+        index_dir = os.path.join(tmp, "index")
+        for builder in ("legacy", "spimi"):
+            rate, rss = measure(builder, corpus, index_dir, args.processes, args.memory_mb)
+            print(f"{builder:<8} {rate:8.0f} docs/s {rss:8.1f} MiB peak rss")
+        size = sum(os.path.getsize(os.path.join(index_dir, name))
+                   for name in os.listdir(index_dir))
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        print(f"index: {meta['docs']} docs, {meta['terms']} terms, "
+              f"{meta['blocks']} blocks merged, {size / 1024 / 1024:.1f} MiB on disk")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=500)
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--memory_mb", type=int, default=64)
+    parser.add_argument("--run", choices=("legacy", "spimi"), default=None)
+    parser.add_argument("--index_dir", type=str, default="index")
+    args = parser.parse_args()
+    if args.run:
+        build(args.run, args.corpus, args.index_dir, args.processes, args.memory_mb)
+    else:
+        main(args)
@@ -0,0 +1,72 @@
+''' Time a worker thread spends per log call with the file and console
+handlers called synchronously, as get_logger used to set up, against
+queueing the record for utils.get_logger's listener thread. The console is
+a stream that blocks for --console_us per write, like a busy terminal.
+
+    python -m benchmarks.bench_logging [--records N] [--console_us US]
+'''
+import logging
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from utils import LOG_FORMAT, flush_logs, get_logger
+
+
+class SlowConsole(object):
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def sync_logger(path):
+    ''' A logger set up as get_logger did before it queued records. '''
+    logger = logging.getLogger("bench-sync")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for handler in (logging.FileHandler(path), logging.StreamHandler()):
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+    return logger
+
+
+def time_calls(logger, count):
+    start = time.perf_counter()
+    for i in range(count):
+        logger.info(f"Downloaded https://www.ics.uci.edu/page/{i}, status <200>, "
+                    f"using cache ('127.0.0.1', 9000).")
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(count, console_us):
+    stderr, sys.stderr = sys.stderr, SlowConsole(console_us / 1e6)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            sync = time_calls(sync_logger(os.path.join(tmp, "sync.log")), count)
+            queued = time_calls(get_logger("bench-queued"), count)
+            start = time.perf_counter()
+            flush_logs()
+            drain = time.perf_counter() - start
+        finally:
+            sys.stderr = stderr
+            os.chdir(cwd)
+    print(f"synchronous handlers {sync:8.1f} us/record in the worker")
+    print(f"queue handler        {queued:8.1f} us/record in the worker, "
+          f"listener still busy {drain:.2f}s after the last one")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--console_us", type=float, default=100)
+    args = parser.parse_args()
+    main(args.records, args.console_us)
@@ -0,0 +1,40 @@
+''' Cost per instrumented call of utils.metrics, disabled and enabled, next
+to a bare loop, and a sample of the Prometheus output.
+
+    python -m benchmarks.bench_metrics [--calls N]
+'''
+import time
+from argparse import ArgumentParser
+
+from utils.metrics import Metrics
+
+
+def time_calls(metrics, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timer("stage"):
+            pass
+        metrics.inc("pages")
+    return time.perf_counter() - start
+
+
+def main(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    bare = time.perf_counter() - start
+    disabled = time_calls(Metrics(), calls)
+    metrics = Metrics()
+    metrics.enable()
+    enabled = time_calls(metrics, calls)
+    print(f"bare loop {bare / calls * 1e9:8.0f} ns/call")
+    print(f"disabled  {disabled / calls * 1e9:8.0f} ns/call")
+    print(f"enabled   {enabled / calls * 1e9:8.0f} ns/call")
+    print(metrics.render())
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.calls)
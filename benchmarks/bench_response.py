@@ -0,0 +1,79 @@
+''' Decode time and peak memory per page of the lazy utils.response.Response
+against the old one that unpickled every payload up front, for pages that
+are only checked for their status and for pages that are scraped.
+
+    python -m benchmarks.bench_response [--pages N] [--size BYTES]
+'''
+import pickle
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import cbor
+import requests
+
+from utils.response import Response
+
+
+class EagerResponse(object):
+    ''' utils.response.Response before it decoded lazily. '''
+
+    def __init__(self, resp_dict):
+        self.url = resp_dict["url"]
+        self.status = resp_dict["status"]
+        self.error = resp_dict["error"] if "error" in resp_dict else None
+        try:
+            self.raw_response = (
+                pickle.loads(resp_dict["response"])
+                if "response" in resp_dict else
+                None)
+        except TypeError:
+            self.raw_response = None
+
+
+def make_payloads(count, size):
+    payloads = []
+    for i in range(count):
+        url = f"https://www.ics.uci.edu/page/{i}"
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.headers["content-type"] = "text/html"
+        resp._content = (f"<html><body><p>page {i}</p>".encode()
+                         + b"<p>lorem ipsum dolor sit amet</p>" * (size // 33))
+        payloads.append(cbor.dumps(
+            {"url": url, "status": 200, "response": pickle.dumps(resp)}))
+    return payloads
+
+
+def measure(cls, payloads, read_content):
+    tracemalloc.start()
+    start = time.perf_counter()
+    responses = []
+    for payload in payloads:
+        resp = cls(cbor.loads(payload))
+        if read_content:
+            resp.raw_response.content
+        else:
+            resp.status
+        responses.append(resp)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(payloads) * 1e6, peak / len(payloads) / 1024
+
+
+def main(count, size):
+    payloads = make_payloads(count, size)
+    for read_content, label in ((False, "status only"), (True, "scraped")):
+        for cls in (EagerResponse, Response):
+            us, kib = measure(cls, payloads, read_content)
+            print(f"{label:<12} {cls.__name__:<14} {us:8.1f} us/page {kib:8.1f} KiB/page peak")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=30000)
+    args = parser.parse_args()
+    main(args.pages, args.size)
@@ -0,0 +1,78 @@
+''' Query latency percentiles of utils.search.SearchEngine, with its postings
+cache cold and warm, over an index of a generated corpus (or an existing
+--index_dir built with python -m utils.index).
+
+    python -m benchmarks.bench_search [--pages N] [--index_dir DIR]
+        [--queries Q] [--scoring bm25|tfidf]
+'''
+import json
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.bench_index import write_corpus
+from utils.index import TERM_RECORD, build_index
+from utils.search import SearchEngine
+
+
+def make_queries(engine, count, seed=0):
+    ''' 1 to 3 term queries, terms drawn in proportion to their df so
+    queries hit long postings lists as often as real ones do. '''
+    rng = random.Random(seed)
+    terms, weights = [], []
+    for term_offset, term_length, df, _, _ in TERM_RECORD.iter_unpack(engine.lexicon):
+        terms.append(engine.terms[term_offset:term_offset + term_length].decode("utf-8"))
+        weights.append(df)
+    return [" ".join(rng.choices(terms, weights, k=rng.randint(1, 3)))
+            for _ in range(count)]
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return {q: ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000
+            for q in (50, 90, 99, 100)}
+
+
+def run(engine, queries, scoring):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        engine.search(query, 10, scoring)
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = args.index_dir
+        if index_dir is None:
+            corpus = os.path.join(tmp, "corpus")
+            os.makedirs(corpus)
+            write_corpus(corpus, args.pages, args.words)
+            index_dir = os.path.join(tmp, "index")
+            build_index(sorted(os.path.join(corpus, name) for name in os.listdir(corpus)),
+                        index_dir, frozenset())
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        print(f"index: {meta['docs']} docs, {meta['terms']} terms")
+        engine = SearchEngine(index_dir, cache_size=args.cache_size)
+        queries = make_queries(engine, args.queries)
+        for label in ("cold", "warm"):
+            p = run(engine, queries, args.scoring)
+            print(f"{label}  p50 {p[50]:7.2f} ms  p90 {p[90]:7.2f} ms  "
+                  f"p99 {p[99]:7.2f} ms  max {p[100]:7.2f} ms")
+        print(f"postings cache: {engine.hits} hits, {engine.misses} misses")
+        engine.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=500)
+    parser.add_argument("--index_dir", type=str, default=None)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--cache_size", type=int, default=256)
+    parser.add_argument("--scoring", choices=("bm25", "tfidf"), default="bm25")
+    main(parser.parse_args())
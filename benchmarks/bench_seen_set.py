@@ -0,0 +1,80 @@
+''' Memory per url and lookups/sec for the frontier's duplicate check.
+
+    python -m benchmarks.bench_seen_set [--urls N]
+'''
+import os
+import shelve
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from crawler.seen import SeenSet
+from utils import get_urlhash
+
+
+def make_urls(count, offset=0):
+    return [f"https://www.ics.uci.edu/page/{i}" for i in range(offset, offset + count)]
+
+
+def time_lookups(contains, urls):
+    start = time.perf_counter()
+    for url in urls:
+        contains(url)
+    return len(urls) / (time.perf_counter() - start)
+
+
+def report(name, bytes_per_url, hits, misses):
+    print(f"{name:<24} {bytes_per_url:8.1f} B/url {hits:10.0f} hits/s {misses:10.0f} misses/s")
+
+
+def bench_shelve(urls, probes, tmp):
+    path = os.path.join(tmp, "seen.shelve")
+    save = shelve.open(path)
+    for url in urls:
+        save[get_urlhash(url)] = (url, False)
+    save.sync()
+    disk = sum(
+        os.path.getsize(os.path.join(tmp, name))
+        for name in os.listdir(tmp) if name.startswith("seen.shelve"))
+    contains = lambda url: get_urlhash(url) in save
+    report("shelve (disk)", disk / len(urls),
+           time_lookups(contains, urls[:len(probes)]), time_lookups(contains, probes))
+    save.close()
+
+
+def bench_hex_set(urls, probes):
+    tracemalloc.start()
+    seen = {get_urlhash(url) for url in urls}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    contains = lambda url: get_urlhash(url) in seen
+    report("set of hex sha256", size / len(urls),
+           time_lookups(contains, urls[:len(probes)]), time_lookups(contains, probes))
+
+
+def bench_seen_set(urls, probes, bloom):
+    seen = SeenSet(capacity=len(urls), bloom=bloom)
+    for url in urls:
+        seen.add(url)
+    seen._merge()
+    contains = seen.__contains__
+    report(f"SeenSet (bloom={bloom})", seen.memory_bytes() / len(urls),
+           time_lookups(contains, urls[:len(probes)]), time_lookups(contains, probes))
+
+
+def main(count):
+    urls = make_urls(count)
+    probes = make_urls(min(count, 100000), offset=count)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_shelve(urls, probes, tmp)
+    bench_hex_set(urls, probes)
+    bench_seen_set(urls, probes, bloom=False)
+    bench_seen_set(urls, probes, bloom=True)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.urls)
@@ -0,0 +1,62 @@
+''' Worker startup cost: replaying Logs/Worker.log once per thread, as
+Worker.run used to, against loading the frontier's saved seen-url set once.
+
+    python -m benchmarks.bench_startup [--pages N] [--threads T]
+'''
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from urllib.parse import urldefrag
+
+from crawler.seen import SeenSet
+
+
+def read_unique_pages(log_file):
+    ''' The log replay each Worker.run did before this change. '''
+    unique_pages = set()
+    with open(log_file, 'r') as file:
+        for line in file:
+            if 'Downloaded' in line and 'status' in line:
+                url = line.split()[1].rstrip(',')
+                url = urldefrag(url)[0]
+                unique_pages.add(url)
+    return unique_pages
+
+
+def main(pages, threads):
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(pages)]
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, "Worker.log")
+        with open(log_file, "w") as f:
+            for i, url in enumerate(urls):
+                f.write(
+                    f"2024-01-01 00:00:00,000 - Worker-{i % threads} - INFO - "
+                    f"Downloaded {url}, status <200>, using cache ('127.0.0.1', 9000).\n")
+        seen = SeenSet(capacity=pages)
+        for url in urls:
+            seen.add(url)
+        seen_file = os.path.join(tmp, "frontier.shelve.seen")
+        seen.save(seen_file)
+
+        start = time.perf_counter()
+        for _ in range(threads):
+            read_unique_pages(log_file)
+        replay = time.perf_counter() - start
+
+        start = time.perf_counter()
+        SeenSet.load(seen_file)
+        load = time.perf_counter() - start
+
+        size = os.path.getsize(log_file) / 2 ** 20
+        print(f"{pages} pages, {size:.0f} MiB log, {threads} threads")
+        print(f"log replay per thread: {replay:8.3f} s")
+        print(f"seen set load once:    {load:8.3f} s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    main(args.pages, args.threads)
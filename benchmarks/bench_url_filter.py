@@ -0,0 +1,97 @@
+''' Urls/sec through the precompiled UrlFilter against the per-call rule
+building and regex matching is_valid used to do (its prints silenced).
+
+    python -m benchmarks.bench_url_filter [--urls N]
+'''
+import contextlib
+import io
+import random
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from utils.url_filter import UrlFilter, is_repeating_path
+
+
+def legacy_is_valid(url, visited_urls):
+    ''' The rule checks of the old scraper.is_valid, without trap counting. '''
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        print(f"Error 603: Invalid scheme in {url}")
+        return False
+    netloc_parts = parsed.netloc.split('.')
+    if len(netloc_parts) < 2:
+        print(f"Error 604: Invalid domain format in {url}")
+        return False
+    domain = ".".join(netloc_parts[-2:])
+    allowed_subdomains = ["ics", "cs", "informatics", "stat"]
+    if parsed.netloc == "today.uci.edu":
+        if not parsed.path.startswith("/department/information_computer_sciences/"):
+            print(f"Error 604: Invalid today.uci.edu path in {url}")
+            return False
+        return True
+    if domain != "uci.edu":
+        print(f"Error 604: Domain not allowed: {domain}")
+        return False
+    if len(netloc_parts) > 2 and netloc_parts[-3] not in allowed_subdomains:
+        print(f"Error 604: Subdomain not allowed: {netloc_parts[-3]}")
+        return False
+    if re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
+        print(f"Error 605: Invalid file extension in {url}")
+        return False
+    if is_repeating_path(parsed.path):
+        return False
+    if len(parsed.path.split("/")) > 5:
+        return False
+    if re.search(r'\d{4}-\d{2}', url):
+        return False
+    if url in visited_urls:
+        return False
+    if parsed.query.count("%") >= 3 or parsed.query.count("=") >= 3 or parsed.query.count("&") >= 3:
+        return False
+    return True
+
+
+def make_urls(count):
+    rng = random.Random(0)
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.stat.uci.edu",
+             "www.google.com", "today.uci.edu", "www.eng.uci.edu"]
+    paths = ["/people/{}", "/files/{}.pdf", "/events/2019-{:02d}", "/a/b/c/d/e/{}",
+             "/research/{}?a=1&b=2", "/~user/{}/index.html"]
+    return [f"https://{rng.choice(hosts)}{rng.choice(paths).format(i % 97)}"
+            for i in range(count)]
+
+
+def main(count):
+    urls = make_urls(count)
+    visited = set(urls[::10])
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for url in urls:
+            legacy_is_valid(url, visited)
+        legacy = time.perf_counter() - start
+    url_filter = UrlFilter()
+    start = time.perf_counter()
+    for batch in range(0, len(urls), 100):
+        url_filter.check_many(urls[batch:batch + 100], visited)
+    engine = time.perf_counter() - start
+    print(f"legacy is_valid {count / legacy:10.0f} urls/s")
+    print(f"UrlFilter       {count / engine:10.0f} urls/s")
+    for reason, n in url_filter.counts.most_common():
+        print(f"  {reason:<16} {n}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.urls)
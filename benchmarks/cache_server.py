@@ -0,0 +1,247 @@
+''' Local stand-in for the course cache server.
+
+Answers GET /?q=<url>&u=<useragent> with the same cbor payload as the real
+cache server, {"url", "status", "response": pickled requests.Response} or
+{"url", "status", "error"} for 6xx errors, serving pages from a recorded
+corpus: a directory of JSON files with "url" and "content" fields, the
+format of the course's crawl dumps. Without a corpus it serves a generated
+site of --pages pages spread over the seed hosts, linking to each other.
+Each request is delayed by --latency seconds (+/- --jitter) and a
+--error_rate fraction of urls, chosen by hash so reruns agree, fail with one
+of --error_codes. With --disallow, every host's robots.txt disallows those
+path prefixes and urls under them get error 608, as on the real server.
+
+    python -m benchmarks.cache_server [--port 9000] [--corpus DIR] [--pages N]
+        [--latency S] [--jitter S] [--error_rate F] [--error_codes 600-608]
+        [--disallow /prefix,...]
+
+Point the crawler at it with launch.py --cache_server 127.0.0.1:9000.
+'''
+import json
+import os
+import pickle
+import random
+import time
+import zlib
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+import requests
+
+SEED_HOSTS = ("www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu",
+              "www.stat.uci.edu")
+
+ERRORS = {
+    600: "Request malformed",
+    601: "Download exception",
+    602: "Spacetime server failure",
+    603: "Scheme has to be either http or https",
+    604: "Domain must be within spec",
+    605: "Not an approved extension",
+    606: "Exception in parsing url",
+    607: "Content too big",
+    608: "Denied by domain robot rules",
+}
+
+
+def normalize(url):
+    return url.rstrip("/")
+
+
+def load_corpus(path):
+    ''' url -> html of every JSON file under path. '''
+    pages = dict()
+    for root, _, files in os.walk(path):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                page = json.load(f)
+            pages[normalize(page["url"])] = page.get("content", "")
+    return pages
+
+
+def synthetic_corpus(count, links=10, words=300, seed=0):
+    ''' A site of count pages over SEED_HOSTS. Every page has `words` words
+    of random text and links to `links` other pages, and each host's root
+    page links to its first pages so the seed urls reach everything. '''
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                          for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    # Pages are spread over named sections so no one path template holds
+    # enough of them to look like a crawler trap.
+    sections = vocabulary[:max(1, count // 100)]
+    urls = [f"https://{SEED_HOSTS[i % len(SEED_HOSTS)]}/{sections[i % len(sections)]}/page/{i}"
+            for i in range(count)]
+    pages = dict()
+    for i, url in enumerate(urls):
+        targets = [urls[(i + 1) % count]] + rng.sample(urls, min(links, count))
+        body = " ".join(rng.choice(vocabulary) for _ in range(words))
+        anchors = "".join(f'<a href="{target}">{target}</a>' for target in targets)
+        pages[url] = (f"<html><head><title>Page {i}</title></head><body>"
+                      f"<p>{body}</p>{anchors}</body></html>")
+    for host in SEED_HOSTS:
+        roots = [url for url in urls if urlparse(url).netloc == host][:links]
+        anchors = "".join(f'<a href="{target}">{target}</a>' for target in roots)
+        pages[f"https://{host}"] = f"<html><body>{anchors}</body></html>"
+    return pages
+
+
+def make_response(url, status, html):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    resp.encoding = "utf-8"
+    resp._content = html.encode("utf-8")
+    resp.headers["content-type"] = "text/html; charset=utf-8"
+    resp.headers["content-length"] = str(len(resp._content))
+    return pickle.dumps(resp)
+
+
+class CacheServer(object):
+    ''' The stand-in server, run on a background thread by start(). '''
+
+    def __init__(self, pages, port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_codes=tuple(ERRORS), disallow=()):
+        self.pages = pages
+        self.disallow = tuple(disallow)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.bodies = dict()  # url -> (encoded answer, error code or None), built on first request
+        self.lock = Lock()
+        self.served = 0
+        self.errors = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; with Nagle on,
+            # every keep-alive request after the first stalls on the
+            # client's delayed ACK.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                if "q" not in query or "u" not in query:
+                    self.send_error(400)
+                    return
+                body = server.answer(query["q"][0])
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def _error_for(self, url):
+        if not self.error_rate:
+            return None
+        roll = zlib.crc32(url.encode("utf-8"))
+        if roll % 10000 >= self.error_rate * 10000:
+            return None
+        return self.error_codes[(roll // 10000) % len(self.error_codes)]
+
+    def answer(self, url):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        key = normalize(url)
+        with self.lock:
+            self.served += 1
+            cached = self.bodies.get(key)
+            if cached is not None:
+                body, error = cached
+                if error is not None:
+                    self.errors += 1
+                return body
+        path = urlparse(key).path
+        if path == "/robots.txt":
+            error = None
+        elif self.disallow and path.startswith(self.disallow):
+            error = 608
+        else:
+            error = self._error_for(key)
+        if path == "/robots.txt":
+            robots = "User-agent: *\n" + "".join(
+                f"Disallow: {prefix}\n" for prefix in self.disallow)
+            body = cbor.dumps({
+                "url": url, "status": 200,
+                "response": make_response(url, 200, robots)})
+        elif error is not None:
+            body = cbor.dumps({"url": url, "status": error, "error": ERRORS[error]})
+        elif key in self.pages:
+            body = cbor.dumps({
+                "url": url, "status": 200,
+                "response": make_response(url, 200, self.pages[key])})
+        else:
+            body = cbor.dumps({
+                "url": url, "status": 404,
+                "response": make_response(url, 404, "<html>Not Found</html>")})
+        with self.lock:
+            if error is not None:
+                self.errors += 1
+            self.bodies[key] = (body, error)
+        return body
+
+    def start(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_codes(spec):
+    ''' "600-602,608" -> (600, 601, 602, 608) '''
+    codes = []
+    for part in spec.split(","):
+        low, _, high = part.partition("-")
+        codes.extend(range(int(low), int(high or low) + 1))
+    assert all(code in ERRORS for code in codes), "error codes must be within 600-608"
+    return tuple(codes)
+
+
+def add_arguments(parser):
+    parser.add_argument("--corpus", type=str, default=None,
+                        help="Directory of JSON pages to serve instead of a generated site.")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--error_codes", type=parse_codes, default=tuple(ERRORS))
+    parser.add_argument("--disallow", type=lambda spec: tuple(spec.split(",")), default=(),
+                        help="Comma separated path prefixes robots.txt disallows.")
+
+
+def from_arguments(args, port=0):
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.pages)
+    return CacheServer(
+        pages, port=port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_codes=args.error_codes,
+        disallow=args.disallow)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = from_arguments(args, args.port)
+    print(f"Serving {len(server.pages)} pages at 127.0.0.1:{args.port}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,98 @@
+''' Run a distributed crawl as N local processes and check it.
+
+Each node runs launch.py --node i in its own directory, against the given
+cache server (see benchmarks/cache_server.py for a local stand-in). When all
+nodes have stopped, reports pages fetched per node and overall pages/sec,
+and checks that no host was fetched by more than one node.
+
+    python -m benchmarks.run_distributed --nodes 3 --cache_server 127.0.0.1:9000
+'''
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from collections import defaultdict
+from configparser import ConfigParser
+from datetime import datetime
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_node_config(base_config, path, nodes, idle_timeout, secret):
+    cparser = ConfigParser()
+    cparser.read(base_config)
+    if not cparser.has_section("DISTRIBUTED"):
+        cparser.add_section("DISTRIBUTED")
+    cparser["DISTRIBUTED"]["NODES"] = ",".join(nodes)
+    cparser["DISTRIBUTED"]["IDLETIMEOUT"] = str(idle_timeout)
+    cparser["DISTRIBUTED"]["SECRET"] = secret
+    with open(path, "w") as f:
+        cparser.write(f)
+
+
+def read_downloads(log_file):
+    ''' (timestamp, url) of every download logged by a node's workers. '''
+    downloads = []
+    if not os.path.exists(log_file):
+        return downloads
+    with open(log_file) as f:
+        for line in f:
+            if " - INFO - Downloaded " not in line:
+                continue
+            stamp = datetime.strptime(line[:23], "%Y-%m-%d %H:%M:%S,%f")
+            url = line.split("Downloaded ", 1)[1].split(",", 1)[0]
+            downloads.append((stamp, url))
+    return downloads
+
+
+def main(count, cache_server, base_config, base_port, engine, idle_timeout):
+    nodes = [f"127.0.0.1:{base_port + i}" for i in range(count)]
+    secret = secrets.token_hex(16)
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = []
+        for node in range(count):
+            workdir = os.path.join(tmp, f"node{node}")
+            os.makedirs(workdir)
+            config_file = os.path.join(workdir, "config.ini")
+            write_node_config(base_config, config_file, nodes, idle_timeout, secret)
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "launch.py"), "--restart",
+                 "--config_file", config_file, "--node", str(node),
+                 "--cache_server", cache_server, "--engine", engine],
+                cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        for process in processes:
+            process.wait()
+
+        owners = defaultdict(set)
+        stamps = []
+        for node in range(count):
+            downloads = read_downloads(os.path.join(tmp, f"node{node}", "Logs", "Worker.log"))
+            print(f"node {node}: {len(downloads)} pages")
+            for stamp, url in downloads:
+                owners[urlparse(url).netloc].add(node)
+                stamps.append(stamp)
+
+    if stamps:
+        elapsed = (max(stamps) - min(stamps)).total_seconds() or 1
+        print(f"total: {len(stamps)} pages, {len(stamps) / elapsed:.1f} pages/s")
+    shared = {host: nodes for host, nodes in owners.items() if len(nodes) > 1}
+    if shared:
+        print(f"FAIL: {len(shared)} hosts fetched by more than one node: {sorted(shared)[:10]}")
+        sys.exit(1)
+    print(f"OK: each of {len(owners)} hosts was fetched by a single node")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--cache_server", type=str, required=True)
+    parser.add_argument("--config_file", type=str, default=os.path.join(ROOT, "config.ini"))
+    parser.add_argument("--base_port", type=int, default=9100)
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread")
+    parser.add_argument("--idle_timeout", type=float, default=10)
+    args = parser.parse_args()
+    main(args.nodes, args.cache_server, args.config_file, args.base_port,
+         args.engine, args.idle_timeout)
@@ -1,4 +1,6 @@
+import scraper
 from utils import get_logger
+from utils.metrics import metrics
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 
@@ -7,8 +9,20 @@ class Crawler(object):
         self.config = config
         self.logger = get_logger("CRAWLER")
         self.frontier = frontier_factory(config, restart)
+        scraper.restore_state(restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        if config.metrics:
+            self._start_metrics()
+
+    def _start_metrics(self):
+        metrics.enable()
+        metrics.gauge("frontier_queued_urls", lambda: len(self.frontier.to_be_downloaded))
+        metrics.gauge("frontier_retry_urls", lambda: len(self.frontier.retries))
+        metrics.gauge("store_buffered_urls", lambda: len(self.frontier.save.buffer))
+        metrics.start(
+            get_logger("METRICS"), self.config.metrics_interval,
+            self.config.metrics_port)
 
     def start_async(self):
         self.workers = [
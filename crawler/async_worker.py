@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+from utils import get_logger
+from utils.metrics import metrics
+from utils.download import DownloadError
+from utils.download_async import make_session, download_async
+from crawler.parse_pool import get_parse
+import scraper
+
+
+class AsyncWorker(Thread):
+    ''' Worker that runs an asyncio loop with many fetches in flight.
+
+    Drop-in for Worker as Crawler's worker_factory: each AsyncWorker keeps
+    up to config.async_concurrency cache server requests in flight, takes
+    urls from the same Frontier (so the per-host politeness schedule is
+    unchanged) and runs the scraper on a separate executor so parsing never
+    blocks the event loop. With PARSEPROCESSES set, the executor threads only
+    hand pages to the shared ParsePool. '''
+
+    # Longest we sleep before polling the frontier again, so urls added by
+    # other tasks are picked up promptly.
+    MAX_POLL_INTERVAL = 0.1
+
+    def __init__(self, worker_id, config, frontier):
+        self.logger = get_logger(f"AsyncWorker-{worker_id}", "Worker")
+        self.config = config
+        self.frontier = frontier
+        self.parse = get_parse(config)
+        self.in_flight = 0
+        super().__init__(daemon=True)
+
+    def run(self):
+        try:
+            asyncio.run(self._crawl())
+            scraper.print_statistics()
+        except Exception as e:
+            self.logger.error(f"An exception occurred: {e}")
+            scraper.print_statistics()
+
+    async def _crawl(self):
+        concurrency = self.config.async_concurrency
+        self.scrape_executor = ThreadPoolExecutor(self.config.threads_count)
+        async with make_session(self.config, concurrency) as session:
+            await asyncio.gather(*(
+                self._fetch_loop(session) for _ in range(concurrency)))
+        self.scrape_executor.shutdown()
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _next_url(self):
+        while True:
+            url, wait = self.frontier.poll_tbd_url()
+            if url is not None:
+                return url
+            if wait is None and self.in_flight == 0:
+                # Nothing queued and no fetch left that could add more.
+                return None
+            await asyncio.sleep(min(wait or self.MAX_POLL_INTERVAL,
+                                    self.MAX_POLL_INTERVAL))
+
+    def _add_urls(self, urls, parent):
+        for url in urls:
+            self.frontier.add_url(url, parent)
+        self.frontier.mark_url_complete(parent)
+
+    async def _fetch_loop(self, session):
+        loop = asyncio.get_running_loop()
+        while True:
+            tbd_url = await self._next_url()
+            if tbd_url is None:
+                return
+            self.in_flight += 1
+            try:
+                start = time.time()
+                try:
+                    with metrics.timer("download"):
+                        resp = await download_async(
+                            tbd_url, self.config, session, self.logger)
+                except DownloadError as e:
+                    metrics.inc("fetch_failures")
+                    self.frontier.record_response(
+                        tbd_url, None, time.time() - start)
+                    self.logger.info(f"Fetch failed: {e}")
+                    self.frontier.retry_url(tbd_url)
+                    continue
+                self.frontier.record_response(
+                    tbd_url, resp.status, time.time() - start)
+                metrics.inc("pages_fetched")
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.")
+                if resp.status == 200:
+                    with metrics.timer("scrape"):
+                        scraped_urls = await loop.run_in_executor(
+                            self.scrape_executor, scraper.scraper, tbd_url, resp,
+                            self.frontier.seen, self.parse)
+                    with metrics.timer("frontier_update"):
+                        # Off the loop: a new host's robots.txt is fetched
+                        # synchronously the first time it is linked to.
+                        await loop.run_in_executor(
+                            self.scrape_executor, self._add_urls, scraped_urls, tbd_url)
+            except Exception as e:
+                self.logger.error(f"An exception occurred: {e}")
+            finally:
+                self.in_flight -= 1
@@ -0,0 +1,248 @@
+import hmac
+import os
+import socket
+import socketserver
+import struct
+import time
+from bisect import bisect
+from hashlib import blake2b
+from threading import Thread, Event
+from urllib.parse import urlparse
+
+from utils import get_logger, normalize
+from crawler.frontier import Frontier
+from crawler.seen import SeenSet
+
+
+# Bytes of the challenge a node sends each peer that connects to it.
+NONCE_SIZE = 16
+# Sends to a peer that may fail in a row before its urls are written to
+# disk instead and it no longer keeps this node from going idle.
+MAX_SEND_FAILURES = 10
+
+
+def parse_address(address):
+    host, port = address.strip().rsplit(":", 1)
+    return host or "127.0.0.1", int(port)
+
+
+def sign(secret, nonce):
+    return hmac.new(secret.encode("utf-8"), nonce, "sha256").digest()
+
+
+def connect(address, secret, timeout=10):
+    ''' A connection to the peer at address, authenticated by answering
+    its challenge with the shared secret. '''
+    sock = socket.create_connection(address, timeout=timeout)
+    try:
+        sock.sendall(sign(secret, recv_exact(sock, NONCE_SIZE)))
+    except (EOFError, OSError):
+        sock.close()
+        raise ConnectionError(f"Peer {address[0]}:{address[1]} closed the connection")
+    return sock
+
+
+class HashRing(object):
+    ''' Consistent hash of keys (hosts) onto node ids, with `replicas`
+    virtual points per node to even out the partitions. '''
+
+    def __init__(self, nodes, replicas=100):
+        self.ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in nodes for i in range(replicas))
+        self.points = [point for point, _ in self.ring]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def node_for(self, key):
+        i = bisect(self.points, self._hash(key)) % len(self.points)
+        return self.ring[i][1]
+
+
+def send_batch(sock, urls):
+    payload = "\n".join(urls).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError
+        data.extend(chunk)
+    return bytes(data)
+
+
+class _BatchHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Peers must answer a fresh challenge before any batch is read.
+        nonce = os.urandom(NONCE_SIZE)
+        try:
+            self.request.settimeout(10)
+            self.request.sendall(nonce)
+            proof = recv_exact(self.request, len(sign(self.server.secret, nonce)))
+            self.request.settimeout(None)
+        except (EOFError, OSError):
+            return
+        if not hmac.compare_digest(proof, sign(self.server.secret, nonce)):
+            self.server.on_reject(self.client_address)
+            return
+        while True:
+            try:
+                size, = struct.unpack(">I", recv_exact(self.request, 4))
+                urls = recv_exact(self.request, size).decode("utf-8").split("\n")
+            except (EOFError, OSError):
+                return
+            self.server.on_urls(urls)
+
+
+class _BatchServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, secret, on_urls, on_reject):
+        self.secret = secret
+        self.on_urls = on_urls
+        self.on_reject = on_reject
+        super().__init__(address, _BatchHandler)
+
+
+class DistributedFrontier(Frontier):
+    ''' Frontier owning one partition of a crawl spread over several nodes.
+
+    Hosts are consistent-hashed onto the nodes listed in config.nodes, so
+    each host is crawled, and its politeness delay kept, by exactly one
+    node. Urls for hosts owned elsewhere are buffered per node and sent in
+    batches of config.forward_batch (or every config.forward_interval
+    seconds) over a TCP connection; urls received from peers are added as if
+    discovered locally. Each node listens on its own NODES address only and
+    reads urls from a peer once it has answered a challenge with
+    config.secret. An empty frontier only ends the crawl once no
+    url has been received or handed out for config.idle_timeout seconds.
+
+    A peer that cannot be reached MAX_SEND_FAILURES times in a row is given
+    up on: its outbox is appended to <save file>.outbox-<node> instead, as
+    are all outboxes when the frontier closes, and those files are queued
+    for sending again when the crawl resumes. '''
+
+    def __init__(self, config, restart):
+        self.node_id = config.node_id
+        self.addresses = [parse_address(node) for node in config.nodes]
+        self.ring = HashRing(range(len(self.addresses)))
+        self.outboxes = {
+            node: list() for node in range(len(self.addresses))
+            if node != self.node_id}
+        self.send_failures = {node: 0 for node in self.outboxes}
+        for node, outbox in self.outboxes.items():
+            path = self._outbox_file(config, node)
+            if os.path.exists(path):
+                if not restart:
+                    with open(path, encoding="utf-8") as f:
+                        outbox.extend(line for line in f.read().split("\n") if line)
+                os.remove(path)
+        self.forwarded = SeenSet(capacity=config.seen_capacity)
+        self.last_activity = time.time()
+        self.flush_now = Event()
+        self.dist_logger = get_logger(f"NODE-{self.node_id}", "FRONTIER")
+        super().__init__(config, restart)
+
+        self.server = _BatchServer(
+            self.addresses[self.node_id], config.secret, self._receive,
+            self._reject)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        Thread(target=self._forward_periodically, daemon=True).start()
+
+    def owner(self, url):
+        return self.ring.node_for(urlparse(url).netloc)
+
+    def add_url(self, url, parent=None):
+        url = normalize(url)
+        owner = self.owner(url)
+        if owner == self.node_id:
+            return super().add_url(url, parent)
+        with self.lock:
+            if self.forwarded.add(url):
+                outbox = self.outboxes[owner]
+                outbox.append(url)
+                if len(outbox) >= self.config.forward_batch:
+                    self.flush_now.set()
+
+    @staticmethod
+    def _outbox_file(config, node):
+        return f"{config.save_file}.outbox-{node}"
+
+    def _spill(self, node, urls):
+        ''' Append urls for node to its outbox file. Called with the lock held. '''
+        with open(self._outbox_file(self.config, node), "a", encoding="utf-8") as f:
+            f.write("".join(f"{url}\n" for url in urls))
+
+    def close(self):
+        with self.lock:
+            for node, outbox in self.outboxes.items():
+                if outbox:
+                    self._spill(node, outbox)
+                    del outbox[:]
+        super().close()
+
+    def _reject(self, address):
+        self.dist_logger.info(
+            f"Dropped connection from {address[0]}:{address[1]}, wrong secret.")
+
+    def _receive(self, urls):
+        for url in urls:
+            super().add_url(url)
+        with self.lock:
+            self.last_activity = time.time()
+
+    def poll_tbd_url(self):
+        url, wait = super().poll_tbd_url()
+        with self.lock:
+            if url is not None:
+                self.last_activity = time.time()
+            elif wait is None and (
+                    time.time() - self.last_activity < self.config.idle_timeout
+                    or any(outbox for node, outbox in self.outboxes.items()
+                           if self.send_failures[node] < MAX_SEND_FAILURES)):
+                # Peers may still send us work.
+                wait = 1.0
+        return url, wait
+
+    def _forward_periodically(self):
+        sockets = dict()
+        while True:
+            self.flush_now.wait(self.config.forward_interval)
+            self.flush_now.clear()
+            for node, outbox in self.outboxes.items():
+                with self.lock:
+                    if not outbox:
+                        continue
+                    batch = outbox[:]
+                    del outbox[:]
+                try:
+                    sock = sockets.get(node)
+                    if sock is None:
+                        sock = sockets[node] = connect(
+                            self.addresses[node], self.config.secret)
+                    send_batch(sock, batch)
+                except OSError as e:
+                    if node in sockets:
+                        sockets.pop(node).close()
+                    with self.lock:
+                        self.send_failures[node] += 1
+                        if self.send_failures[node] < MAX_SEND_FAILURES:
+                            outbox[:0] = batch
+                        else:
+                            self._spill(node, batch)
+                    if self.send_failures[node] < MAX_SEND_FAILURES:
+                        self.dist_logger.info(
+                            f"Could not forward {len(batch)} urls to node {node}: {e}")
+                    else:
+                        self.dist_logger.warning(
+                            f"Gave up forwarding {len(batch)} urls to node {node}, "
+                            f"saved to {self._outbox_file(self.config, node)}: {e}")
+                else:
+                    with self.lock:
+                        self.send_failures[node] = 0
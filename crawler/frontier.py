@@ -1,19 +1,135 @@
+import atexit
 import os
-import shelve
 import time
+from collections import OrderedDict
+from heapq import heappush, heappop, nsmallest
+from itertools import count
 from urllib.parse import urlparse
 
-from threading import RLock
+from threading import RLock, Condition
 from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils.metrics import metrics
+from crawler.store import BACKENDS, WriteBehindStore
+from crawler.seen import SeenSet
+from crawler.scoring import make_scorer
+from crawler.rate import RateController
+from crawler.robots import RobotsCache, fetch_robots
+
+# Depths of urls handed out are remembered until they are completed, so
+# their links can be scored; failed urls never complete, hence the cap.
+MAX_TRACKED_DEPTHS = 100000
+
+
+class HostScheduler(object):
+    ''' Per-host priority queues, served in politeness order.
+
+    Each host's urls sit in a heap of (score, seq, url, depth). Hosts still
+    inside their politeness delay wait in a min-heap keyed by the earliest
+    time they may be hit again; once that time passes they move to a heap
+    keyed by their best url's score, and pop() serves the best url among
+    the hosts that are ready now. `delay` maps a host to its current
+    politeness delay in seconds. Each host queue is capped at
+    `max_per_host` urls, dropping its worst scored ones; dropped urls stay
+    pending in the save file and are queued again on resume.
+    Not thread safe on its own, the Frontier guards it with its lock. '''
+
+    def __init__(self, delay, max_per_host=None):
+        self.delay = delay
+        self.max_per_host = max_per_host
+        self.queues = dict()        # host -> heap of (score, seq, url, depth)
+        self.waiting = list()       # heap of (next allowed time, host)
+        self.ready = list()         # heap of (best score, seq, host), may hold stale entries
+        self.ready_hosts = set()
+        self.next_allowed = dict()  # host -> earliest time of next fetch
+        self.counter = count()
+        self.pending = 0
+
+    def __len__(self):
+        return self.pending
+
+    def push(self, url, score=0, depth=0):
+        host = urlparse(url).netloc
+        queue = self.queues.setdefault(host, list())
+        entry = (score, next(self.counter), url, depth)
+        heappush(queue, entry)
+        self.pending += 1
+        if len(queue) == 1:
+            # Host had nothing queued, it starts out waiting for its delay.
+            heappush(self.waiting, (self.next_allowed.get(host, 0), host))
+        elif host in self.ready_hosts and queue[0] is entry:
+            heappush(self.ready, (score, entry[1], host))
+        if self.max_per_host and len(queue) > self.max_per_host * 5 // 4:
+            self.queues[host] = nsmallest(self.max_per_host, queue)
+            self.pending -= len(queue) - self.max_per_host
+
+    def hold(self, host, until):
+        ''' Keep host from being served before `until`, moving it back to
+        waiting if it is ready now. '''
+        if until > self.next_allowed.get(host, 0):
+            self.next_allowed[host] = until
+            if host in self.ready_hosts:
+                # Its entry in ready goes stale and is skipped by pop().
+                self.ready_hosts.discard(host)
+                heappush(self.waiting, (until, host))
+
+    def _promote(self, now):
+        while self.waiting and self.waiting[0][0] <= now:
+            _, host = heappop(self.waiting)
+            if self.next_allowed.get(host, 0) > now:
+                # Held back since it started waiting.
+                heappush(self.waiting, (self.next_allowed[host], host))
+                continue
+            score, seq = self.queues[host][0][:2]
+            self.ready_hosts.add(host)
+            heappush(self.ready, (score, seq, host))
+
+    def wait_time(self, now=None):
+        ''' Seconds until some host is ready, None if nothing is queued. '''
+        now = time.time() if now is None else now
+        self._promote(now)
+        if self.ready_hosts:
+            return 0
+        if not self.waiting:
+            return None
+        return max(0, self.waiting[0][0] - now)
+
+    def pop(self, now=None):
+        ''' Pop (url, depth) of the best url among hosts ready at `now`,
+        or None. '''
+        now = time.time() if now is None else now
+        self._promote(now)
+        while self.ready:
+            score, seq, host = heappop(self.ready)
+            queue = self.queues.get(host)
+            if host not in self.ready_hosts or queue[0][:2] != (score, seq):
+                continue
+            _, _, url, depth = heappop(queue)
+            self.pending -= 1
+            self.ready_hosts.discard(host)
+            self.next_allowed[host] = now + self.delay(host)
+            if queue:
+                heappush(self.waiting, (self.next_allowed[host], host))
+            else:
+                del self.queues[host]
+            return url, depth
+        return None
+
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
         self.lock = RLock()  # Adding a lock for thread safety
-        self.domains_last_accessed = {}  # For storing the last accessed time of domains
+        self.has_work = Condition(self.lock)
+        self.rates = RateController(self.config.time_delay, self.config.max_delay)
+        self.to_be_downloaded = HostScheduler(
+            self.rates.delay, self.config.max_queued_per_host)
+        self.scorer = make_scorer(self.config.scorer)
+        self.depths = OrderedDict()
+        self.retries = list()   # heap of (time it may be fetched again, url, depth)
+        self.attempts = dict()  # url -> failed fetches so far
+        backend = BACKENDS[self.config.store]
+        seen_file = f"{self.config.save_file}.seen"
 
         if not os.path.exists(self.config.save_file) and not restart:
             self.logger.info(
@@ -22,10 +138,22 @@ class Frontier(object):
         elif os.path.exists(self.config.save_file) and restart:
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            backend.remove(self.config.save_file)
+            if os.path.exists(seen_file):
+                os.remove(seen_file)
 
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = WriteBehindStore(
+            backend(self.config.save_file),
+            batch_size=self.config.flush_batch,
+            flush_interval=self.config.flush_interval)
+        self.seen = self._load_seen(seen_file)
+        self.robots = None
+        if self.config.robots:
+            self.robots = RobotsCache(
+                self._fetch_robots, self.config.user_agent, f"{self.config.save_file}.robots",
+                ttl=self.config.robots_ttl)
+        atexit.register(self.close)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
@@ -40,45 +168,169 @@ class Frontier(object):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        # Urls were filtered by the scraper before they were saved, but
+        # robots.txt may have changed, or not been checked, since. Depths
+        # are not saved, so resumed urls are all scored at depth 0 and the
+        # depth scorer's order only holds for urls found after resuming.
+        for url in self.save.pending():
+            if not self._robots_allow(url):
+                self.save[get_urlhash(url)] = (url, True)
+                continue
+            self.to_be_downloaded.push(url, self.scorer.score(url, 0))
+            tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def _load_seen(self, seen_file):
+        ''' Load the seen-url digests saved at the last clean exit, rebuilding
+        them from the save file if they are missing or out of date. '''
+        seen = SeenSet.load(seen_file) if os.path.exists(seen_file) else None
+        if seen is None or len(seen) != len(self.save):
+            seen = SeenSet(capacity=self.config.seen_capacity)
+            for url, _ in self.save.values():
+                seen.add(url)
+        return seen
+
+    def poll_tbd_url(self):
+        ''' Non-blocking get_tbd_url.
+
+        Returns (url, None) if some host is ready, (None, seconds) if every
+        queued host is still cooling down, and (None, None) if nothing is
+        queued. '''
+        with self.lock:
+            now = time.time()
+            while self.retries and self.retries[0][0] <= now:
+                _, url, depth = heappop(self.retries)
+                self.to_be_downloaded.push(
+                    url, self.scorer.score(url, depth), depth)
+            wait = self.to_be_downloaded.wait_time(now)
+            if self.retries and (wait is None or wait > 0):
+                retry_wait = self.retries[0][0] - now
+                wait = retry_wait if wait is None else min(wait, retry_wait)
+            if wait is None or wait > 0:
+                return None, wait
+            url, depth = self.to_be_downloaded.pop()
+            self.scorer.fetched(url)
+            self.depths[url] = depth
+            if len(self.depths) > MAX_TRACKED_DEPTHS:
+                self.depths.popitem(last=False)
+            return url, None
+
     def get_tbd_url(self):
-        with self.lock:  # Ensuring thread safety
-            try:
-                url = self.to_be_downloaded.pop()
-                domain = self.get_domain(url)
-                if domain in self.domains_last_accessed:
-                    elapsed_time = time.time() - self.domains_last_accessed[domain]
-                    if elapsed_time < 0.5:
-                        time.sleep(0.5 - elapsed_time)
-                self.domains_last_accessed[domain] = time.time()
-                return url
-            except IndexError:
-                return None
-
-    def add_url(self, url):
+        ''' Return a url whose host is past its politeness delay.
+
+        Only blocks when every queued host is still cooling down, and the
+        wait releases the lock so other workers can keep adding urls. '''
+        with self.has_work:
+            while True:
+                url, wait = self.poll_tbd_url()
+                if url is not None:
+                    return url
+                if wait is None:
+                    return None
+                with metrics.timer("politeness_wait"):
+                    self.has_work.wait(wait)
+
+    def _fetch_robots(self, url):
+        ''' Fetch a robots.txt for the RobotsCache in the host's politeness
+        slot: wait out the host's delay first, and hold the host for its
+        delay afterwards, like any other fetch from it. '''
+        host = self.get_domain(url)
+        with self.lock:
+            wait = self.to_be_downloaded.next_allowed.get(host, 0) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return fetch_robots(url, self.config, self.logger)
+        finally:
+            with self.lock:
+                self.to_be_downloaded.hold(host, time.time() + self.rates.delay(host))
+
+    def _robots_allow(self, url):
+        ''' Whether robots.txt lets us fetch url, applying the host's
+        Crawl-delay. The first url of a host waits for its robots.txt to be
+        fetched; call without holding the frontier lock. '''
+        if self.robots is None:
+            return True
+        rules = self.robots.rules(url)
+        if not rules.allowed(url):
+            metrics.inc("robots_disallowed")
+            return False
+        if rules.crawl_delay:
+            with self.lock:
+                self.rates.set_min_delay(self.get_domain(url), rules.crawl_delay)
+        return True
+
+    def add_url(self, url, parent=None):
+        ''' Queue url if it is new and robots.txt allows it. parent is the
+        page it was found on, if any, and is used to score it.
+
+        The first url of a host waits for the host's robots.txt to be
+        fetched, without holding the frontier lock. '''
         url = normalize(url)
+        if not self._robots_allow(url):
+            return
         with self.lock:  # Ensuring thread safety
-            urlhash = get_urlhash(url)
-            if urlhash not in self.save:
-                self.save[urlhash] = (url, False)
-                self.save.sync()
-                self.to_be_downloaded.append(url)
+            new = self.seen.add(url)
+            if new:
+                depth = self.depths.get(parent, 0) + 1 if parent else 0
+                self.save[get_urlhash(url)] = (url, False)
+                self.to_be_downloaded.push(
+                    url, self.scorer.score(url, depth), depth)
+                self.has_work.notify()
+                metrics.inc("urls_added")
+            if parent:
+                self.scorer.discovered(parent, url, new)
+
+    def record_response(self, url, status, elapsed):
+        ''' Adapt the url's host delay to how its fetch went; status is None
+        if the fetch got no response. The next fetch from the host waits at
+        least the new delay from now. '''
+        with self.lock:
+            delay = self.rates.record(url, status, elapsed)
+            self.to_be_downloaded.hold(self.get_domain(url), time.time() + delay)
+
+    def retry_url(self, url):
+        ''' Queue url again after a fetch that timed out or failed, waiting
+        RETRYDELAY seconds, doubled for every earlier failure. After
+        MAXATTEMPTS failures the url is given up on and marked complete.
+        Returns whether it will be retried. '''
+        with self.lock:
+            attempts = self.attempts.get(url, 0) + 1
+            if attempts >= self.config.max_attempts:
+                self.logger.error(f"Giving up on {url} after {attempts} attempts.")
+                self.mark_url_complete(url)
+                return False
+            self.attempts[url] = attempts
+            metrics.inc("fetch_retries")
+            heappush(self.retries, (
+                time.time() + self.config.retry_delay * 2 ** (attempts - 1),
+                url, self.depths.get(url, 0)))
+            self.has_work.notify()
+            return True
 
     def mark_url_complete(self, url):
         with self.lock:  # Ensuring thread safety
-            urlhash = get_urlhash(url)
-            if urlhash not in self.save:
+            if url not in self.seen:
                 self.logger.error(
                     f"Completed url {url}, but have not seen it before.")
-            self.save[urlhash] = (url, True)
-            self.save.sync()
+            self.save[get_urlhash(url)] = (url, True)
+            self.depths.pop(url, None)
+            self.attempts.pop(url, None)
+
+    def close(self):
+        with self.lock:
+            slowest = sorted(
+                self.rates.rates().items(), key=lambda item: -item[1]["delay"])[:10]
+            for host, rate in slowest:
+                self.logger.info(
+                    f"{host}: delay {rate['delay']:.2f}s, latency {rate['latency']:.2f}s, "
+                    f"error rate {rate['error_rate']:.2f} over {rate['responses']} responses")
+            self.seen.save(f"{self.config.save_file}.seen")
+            if self.robots is not None:
+                self.robots.save()
+            self.save.close()
 
     @staticmethod
     def get_domain(url):
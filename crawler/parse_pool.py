@@ -0,0 +1,43 @@
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+import scraper
+
+_pool = None
+_pool_lock = Lock()
+
+
+def _ignore_interrupt():
+    # Children are forked with the crawler's SIGINT handler; only the parent
+    # may print statistics and write the checkpoint on Ctrl-C.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ParsePool(object):
+    ''' Runs scraper.parse_page in worker processes.
+
+    Workers keep doing the I/O on their threads and only wait on the future
+    here, which releases the GIL, while BeautifulSoup, tokenizing and Simhash
+    run in parallel across processes. '''
+
+    def __init__(self, processes):
+        self.executor = ProcessPoolExecutor(processes, initializer=_ignore_interrupt)
+
+    def parse(self, url, content):
+        return self.executor.submit(scraper.parse_page, url, content).result()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+def get_parse(config):
+    ''' The parse callable for scraper.scraper: a shared ParsePool's parse if
+    PARSEPROCESSES is above 0, otherwise parse in the calling thread. '''
+    global _pool
+    if config.parse_processes <= 0:
+        return scraper.parse_page
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool(config.parse_processes)
+        return _pool.parse
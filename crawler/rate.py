@@ -0,0 +1,73 @@
+from urllib.parse import urlparse
+
+# Cache server statuses that reject the url itself (bad scheme, domain,
+# extension, parse error, size, robots.txt) and say nothing about the host.
+POLICY_STATUSES = frozenset([603, 604, 605, 606, 607, 608])
+
+
+class RateController(object):
+    ''' AIMD politeness delay per host.
+
+    Each host's request rate grows by `increase` requests/sec after every
+    healthy response and is divided by `backoff` after a 5xx/6xx error, a
+    fetch that got no response at all (status None) or a response slower
+    than `slow`, keeping its delay between `min_delay` and
+    `max_delay`. The delay is also never shorter than the host's recent
+    response time, so a slow host does not get overlapping requests, nor
+    shorter than a floor set for the host with set_min_delay (its robots.txt
+    Crawl-delay), which may exceed `max_delay`.
+    Not thread safe on its own, the Frontier guards it with its lock. '''
+
+    def __init__(self, min_delay, max_delay, increase=0.1, backoff=2.0,
+                 slow=5.0, smoothing=0.2):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.increase = increase
+        self.backoff = backoff
+        self.slow = slow
+        self.smoothing = smoothing
+        self.hosts = dict()  # host -> [rate, latency ewma, error rate ewma, responses]
+        self.min_delays = dict()  # host -> delay floor
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = [1 / self.min_delay if self.min_delay else float("inf"), 0.0, 0.0, 0]
+        return state
+
+    def set_min_delay(self, host, delay):
+        self.min_delays[host] = delay
+
+    def delay(self, host):
+        floor = self.min_delays.get(host, 0)
+        state = self.hosts.get(host)
+        if state is None:
+            return max(floor, self.min_delay)
+        rate, latency = state[0], state[1]
+        return max(floor, min(self.max_delay, max(1 / rate, latency, self.min_delay)))
+
+    def record(self, url, status, elapsed):
+        ''' Feed back one response; returns the host's new delay. '''
+        host = urlparse(url).netloc
+        state = self._state(host)
+        error = status is None or (status >= 500 and status not in POLICY_STATUSES)
+        alpha = self.smoothing
+        state[1] += alpha * (elapsed - state[1])
+        state[2] += alpha * ((1.0 if error else 0.0) - state[2])
+        state[3] += 1
+        max_rate = 1 / self.min_delay if self.min_delay else float("inf")
+        if error or elapsed > self.slow:
+            state[0] = max(1 / self.max_delay, min(state[0], max_rate) / self.backoff)
+        else:
+            state[0] = min(max_rate, state[0] + self.increase)
+        return self.delay(host)
+
+    def rates(self):
+        ''' Current delay, response time and error rate for every host. '''
+        return {
+            host: {
+                "delay": self.delay(host),
+                "latency": state[1],
+                "error_rate": state[2],
+                "responses": state[3]}
+            for host, state in self.hosts.items()}
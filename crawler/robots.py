@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+from utils.download import download, DownloadError
+
+# Longest Crawl-delay honoured, in seconds.
+MAX_CRAWL_DELAY = 60
+# The product token robots.txt groups are matched against: the leading
+# name of the user agent, e.g. "IR" of "IR UF24 ...".
+PRODUCT_TOKEN_RE = re.compile(r"[a-z_-]+", re.IGNORECASE)
+
+
+class RobotRules(object):
+    ''' The Allow/Disallow rules and Crawl-delay that apply to us in one
+    host's robots.txt.
+
+    Each rule is compiled to a regex ("*" matches anything, a trailing "$"
+    anchors the end) and the rules are tried longest pattern first, Allow
+    before Disallow on ties, so the first match decides as in RFC 9309. '''
+
+    def __init__(self, rules=(), crawl_delay=None):
+        ordered = sorted(rules, key=lambda rule: (-len(rule[0]), not rule[1]))
+        self.rules = [(self._compile(pattern), allow) for pattern, allow in ordered]
+        self.crawl_delay = crawl_delay
+
+    @staticmethod
+    def _compile(pattern):
+        anchored = pattern.endswith("$")
+        if anchored:
+            pattern = pattern[:-1]
+        regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+        return re.compile(regex + ("$" if anchored else ""))
+
+    @classmethod
+    def parse(cls, text, user_agent):
+        ''' Rules of the groups naming user_agent, or of the "*" groups if
+        none does. A group names us if its user-agent line equals our
+        product token or our whole user agent, ignoring case. '''
+        agent = user_agent.strip().lower()
+        token = PRODUCT_TOKEN_RE.match(agent)
+        names = {agent, token.group()} if token else {agent}
+        groups = list()  # (agents, rules, crawl delay)
+        agents, rules, delay, in_rules = list(), list(), None, False
+        for line in text.splitlines():
+            field, _, value = line.split("#", 1)[0].partition(":")
+            field, value = field.strip().lower(), value.strip()
+            if field == "user-agent":
+                if in_rules:
+                    groups.append((agents, rules, delay))
+                    agents, rules, delay, in_rules = list(), list(), None, False
+                agents.append(value.lower())
+            elif field in ("allow", "disallow"):
+                in_rules = True
+                if value:
+                    rules.append((value, field == "allow"))
+            elif field == "crawl-delay":
+                in_rules = True
+                try:
+                    delay = float(value)
+                except ValueError:
+                    pass
+        if agents:
+            groups.append((agents, rules, delay))
+        matching = [group for group in groups
+                    if any(name in names for name in group[0])]
+        if not matching:
+            matching = [group for group in groups if "*" in group[0]]
+        delays = [delay for _, _, delay in matching if delay is not None]
+        return cls(
+            [rule for _, rules, _ in matching for rule in rules],
+            min(max(delays), MAX_CRAWL_DELAY) if delays else None)
+
+    def allowed(self, url):
+        parsed = urlsplit(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        if path == "/robots.txt":
+            return True
+        for regex, allow in self.rules:
+            if regex.match(path):
+                return allow
+        return True
+
+
+ALLOW_ALL = RobotRules()
+
+
+def fetch_robots(url, config, logger=None):
+    ''' Text of the robots.txt at url through the cache server, "" if there
+    is none (4xx) and None if it could not be fetched. '''
+    try:
+        resp = download(url, config, logger)
+    except DownloadError:
+        return None
+    if resp.status == 200:
+        content = resp.content
+        return content.decode("utf-8", "replace") if content else ""
+    if 400 <= resp.status < 500:
+        return ""
+    return None
+
+
+class RobotsCache(object):
+    ''' robots.txt rules per host, fetched on first use with
+    fetch(robots url) -> text, "" or None (see fetch_robots).
+
+    Rules are kept for `ttl` seconds, or `error_ttl` when robots.txt could
+    not be fetched, in which case the host is crawled as if it had none.
+    The texts are saved to `path` by save() and loaded back at start, so a
+    restart does not refetch them. Only one thread fetches a given host's
+    robots.txt; others asking for it meanwhile wait for the result. '''
+
+    def __init__(self, fetch, user_agent, path=None, ttl=86400, error_ttl=600):
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.path = path
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.texts = dict()     # host -> (expiry time, robots.txt text or None)
+        self.compiled = dict()  # host -> (expiry time, RobotRules)
+        self.host_locks = dict()
+        self.lock = Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except ValueError:
+                saved = dict()
+            now = time.time()
+            for host, (expires, text) in saved.items():
+                if expires > now:
+                    self._store(host, expires, text)
+
+    def _store(self, host, expires, text):
+        rules = RobotRules.parse(text, self.user_agent) if text else ALLOW_ALL
+        with self.lock:
+            self.texts[host] = (expires, text)
+            self.compiled[host] = (expires, rules)
+        return rules
+
+    def _cached(self, host):
+        entry = self.compiled.get(host)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        return None
+
+    def rules(self, url):
+        ''' RobotRules for url's host, fetching its robots.txt if needed. '''
+        parsed = urlsplit(url)
+        host = parsed.netloc
+        rules = self._cached(host)
+        if rules is not None:
+            return rules
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, Lock())
+        with host_lock:
+            rules = self._cached(host)
+            if rules is None:
+                text = self.fetch(f"{parsed.scheme}://{host}/robots.txt")
+                ttl = self.error_ttl if text is None else self.ttl
+                rules = self._store(host, time.time() + ttl, text)
+        with self.lock:
+            self.host_locks.pop(host, None)
+        return rules
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            saved = dict(self.texts)
+        with open(self.path, "w") as f:
+            json.dump(saved, f)
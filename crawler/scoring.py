@@ -0,0 +1,141 @@
+import re
+from array import array
+from collections import Counter, OrderedDict
+from urllib.parse import urlsplit
+from zlib import crc32
+
+DIGITS_RE = re.compile(r"\d+")
+
+
+def path_template(url):
+    ''' host/path with runs of digits collapsed, e.g. /event/2019/12 -> /event/#/# '''
+    parsed = urlsplit(url)
+    return f"{parsed.netloc}{DIGITS_RE.sub('#', parsed.path)}"
+
+
+def section(url):
+    ''' host plus first path segment, the unit past yield is tracked for. '''
+    parsed = urlsplit(url)
+    return f"{parsed.netloc}/{parsed.path.strip('/').split('/', 1)[0]}"
+
+
+class Scorer(object):
+    ''' Priority for urls in the frontier; lower scores are fetched first.
+
+    score() is called when a url is queued, fetched() when it is handed to a
+    worker and discovered() for every link a fetched page yields, so scorers
+    can learn from the crawl. The Frontier calls all three under its lock. '''
+
+    def score(self, url, depth):
+        raise NotImplementedError
+
+    def fetched(self, url):
+        pass
+
+    def discovered(self, parent, url, new):
+        pass
+
+
+class DepthScorer(Scorer):
+    ''' Breadth first: pages closer to the seeds first. '''
+
+    def score(self, url, depth):
+        return depth
+
+
+class HostFairnessScorer(Scorer):
+    ''' Hosts that have had fewer pages fetched first. '''
+
+    def __init__(self):
+        self.fetches = Counter()
+
+    def score(self, url, depth):
+        return self.fetches[urlsplit(url).netloc]
+
+    def fetched(self, url):
+        self.fetches[urlsplit(url).netloc] += 1
+
+
+class NoveltyScorer(Scorer):
+    ''' Urls whose path template has been queued less often first, so
+    calendars and other generated pages sink. Templates are counted in a
+    fixed size table of hashed buckets, so memory stays constant. '''
+
+    def __init__(self, buckets=1 << 20):
+        self.counts = array("I", bytes(4 * buckets))
+
+    def score(self, url, depth):
+        bucket = crc32(path_template(url).encode("utf-8")) % len(self.counts)
+        count = self.counts[bucket]
+        if count < 0xFFFFFFFF:
+            self.counts[bucket] = count + 1
+        return count
+
+
+class YieldScorer(Scorer):
+    ''' Urls from sections whose fetched pages have yielded the most new
+    links per page first. Tracks at most `max_sections` sections. '''
+
+    def __init__(self, max_sections=100000):
+        self.max_sections = max_sections
+        self.sections = OrderedDict()  # section -> [pages fetched, new links]
+
+    def _stats(self, url):
+        key = section(url)
+        stats = self.sections.get(key)
+        if stats is None:
+            stats = self.sections[key] = [0, 0]
+            if len(self.sections) > self.max_sections:
+                self.sections.popitem(last=False)
+        else:
+            self.sections.move_to_end(key)
+        return stats
+
+    def score(self, url, depth):
+        pages, new_links = self._stats(url)
+        # Unknown sections are assumed to be worth one new link per page.
+        return -(new_links + 1) / (pages + 1)
+
+    def fetched(self, url):
+        self._stats(url)[0] += 1
+
+    def discovered(self, parent, url, new):
+        if new:
+            self._stats(parent)[1] += 1
+
+
+class CombinedScorer(Scorer):
+    ''' Sum of several scorers. '''
+
+    def __init__(self, scorers):
+        self.scorers = scorers
+
+    def score(self, url, depth):
+        return sum(scorer.score(url, depth) for scorer in self.scorers)
+
+    def fetched(self, url):
+        for scorer in self.scorers:
+            scorer.fetched(url)
+
+    def discovered(self, parent, url, new):
+        for scorer in self.scorers:
+            scorer.discovered(parent, url, new)
+
+
+SCORERS = {
+    "depth": DepthScorer,
+    "host": HostFairnessScorer,
+    "novelty": NoveltyScorer,
+    "yield": YieldScorer,
+}
+
+
+def make_scorer(names):
+    ''' Scorer for a comma separated list of SCORERS names. '''
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    assert names and all(name in SCORERS for name in names), \
+        f"SCORER should be a comma separated list of {', '.join(SCORERS)}"
+    scorers = [SCORERS[name]() for name in names]
+    if len(scorers) == 1:
+        return scorers[0]
+    return CombinedScorer(scorers)
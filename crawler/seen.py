@@ -0,0 +1,127 @@
+import math
+import struct
+from array import array
+from bisect import bisect_left
+
+from utils import get_urldigest
+
+
+class BloomFilter(object):
+    ''' Bit array sized for `capacity` items at roughly `error_rate` false
+    positives. Items are 64 bit digests, split into two halves for double
+    hashing, so no extra hashing is done per probe. '''
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        h1, h2 = digest & 0xFFFFFFFF, (digest >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest):
+        for pos in self._positions(digest):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class SeenSet(object):
+    ''' Set of urls seen by the frontier, stored as 8 byte digests.
+
+    Digests live in a sorted array('Q') searched with bisect, with new ones
+    collecting in a small set that is merged in every `merge_every` adds.
+    An optional Bloom filter in front answers most misses without touching
+    either. Adds must hold the Frontier's lock; lookups from other threads
+    may race with an add and miss it, which the Frontier re-checks. '''
+
+    def __init__(self, capacity=1000000, error_rate=0.01, merge_every=50000,
+                 bloom=True):
+        self.digests = array("Q")
+        self.recent = set()
+        self.merge_every = merge_every
+        self.bloom = BloomFilter(capacity, error_rate) if bloom else None
+
+    def __len__(self):
+        return len(self.digests) + len(self.recent)
+
+    def __contains__(self, url):
+        return self._contains(get_urldigest(url))
+
+    def _contains(self, digest):
+        if self.bloom is not None and digest not in self.bloom:
+            return False
+        if digest in self.recent:
+            return True
+        i = bisect_left(self.digests, digest)
+        return i < len(self.digests) and self.digests[i] == digest
+
+    def add(self, url):
+        ''' Add url, returning False if it was already in the set. '''
+        digest = get_urldigest(url)
+        if self._contains(digest):
+            return False
+        self.recent.add(digest)
+        if self.bloom is not None:
+            self.bloom.add(digest)
+        if len(self.recent) >= self.merge_every:
+            self._merge()
+        return True
+
+    def _merge(self):
+        ''' Merge the sorted recent digests into a new array in one pass:
+        each one's place in the old array is found by bisect and the runs of
+        old digests between them are copied as slices. The old array is
+        swapped out only once the new one is complete, so concurrent lookups
+        never see it half merged. '''
+        if not self.recent:
+            return
+        old = self.digests
+        merged = array("Q", bytes(8 * (len(old) + len(self.recent))))
+        start = 0
+        for n, digest in enumerate(sorted(self.recent)):
+            end = bisect_left(old, digest, start)
+            merged[start + n:end + n] = old[start:end]
+            merged[end + n] = digest
+            start = end
+        merged[start + len(self.recent):] = old[start:]
+        self.digests = merged
+        self.recent = set()
+
+    def save(self, path):
+        self._merge()
+        with open(path, "wb") as f:
+            bloom = self.bloom
+            f.write(struct.pack(
+                "<QQQ", len(self.digests),
+                bloom.size if bloom else 0, bloom.hashes if bloom else 0))
+            self.digests.tofile(f)
+            if bloom is not None:
+                f.write(bloom.bits)
+
+    @classmethod
+    def load(cls, path, merge_every=50000):
+        seen = cls(capacity=1, merge_every=merge_every, bloom=False)
+        with open(path, "rb") as f:
+            count, bloom_size, bloom_hashes = struct.unpack("<QQQ", f.read(24))
+            seen.digests.fromfile(f, count)
+            if bloom_size:
+                seen.bloom = BloomFilter(1)
+                seen.bloom.size, seen.bloom.hashes = bloom_size, bloom_hashes
+                seen.bloom.bits = bytearray(f.read((bloom_size + 7) // 8))
+        return seen
+
+    def memory_bytes(self):
+        ''' Approximate bytes held, for reporting memory per url. '''
+        size = self.digests.itemsize * self.digests.buffer_info()[1]
+        # set slots plus a boxed int per pending digest
+        size += len(self.recent) * (8 + 16 + 36)
+        if self.bloom is not None:
+            size += len(self.bloom.bits)
+        return size
@@ -0,0 +1,189 @@
+import atexit
+import os
+import shelve
+import sqlite3
+import time
+from threading import RLock, Thread, Event
+from urllib.parse import urlparse
+
+from utils.metrics import metrics
+
+
+class ShelveBackend(object):
+    ''' Frontier state kept in a shelve, keyed by urlhash -> (url, completed). '''
+
+    def __init__(self, path):
+        self.db = shelve.open(path)
+
+    def __contains__(self, urlhash):
+        return urlhash in self.db
+
+    def __len__(self):
+        return len(self.db)
+
+    def get(self, urlhash, default=None):
+        return self.db.get(urlhash, default)
+
+    def values(self):
+        return self.db.values()
+
+    def pending(self):
+        for url, completed in self.db.values():
+            if not completed:
+                yield url
+
+    def write_batch(self, items):
+        for urlhash, value in items:
+            self.db[urlhash] = value
+        self.db.sync()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def remove(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class SqliteBackend(object):
+    ''' Frontier state in a SQLite database running in WAL mode.
+
+    Rows are keyed by urlhash and indexed on (completed, host), so resuming
+    is one indexed query for the pending urls rather than a full scan. '''
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, "
+            "host TEXT NOT NULL, completed INTEGER NOT NULL)")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS urls_completed_host "
+            "ON urls (completed, host)")
+        self.db.commit()
+
+    def __contains__(self, urlhash):
+        return self.db.execute(
+            "SELECT 1 FROM urls WHERE urlhash = ?", (urlhash,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def get(self, urlhash, default=None):
+        row = self.db.execute(
+            "SELECT url, completed FROM urls WHERE urlhash = ?", (urlhash,)
+        ).fetchone()
+        return (row[0], bool(row[1])) if row else default
+
+    def values(self):
+        for url, completed in self.db.execute(
+                "SELECT url, completed FROM urls"):
+            yield url, bool(completed)
+
+    def pending(self):
+        for (url,) in self.db.execute(
+                "SELECT url FROM urls WHERE completed = 0"):
+            yield url
+
+    def write_batch(self, items):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO urls (urlhash, url, host, completed) "
+                "VALUES (?, ?, ?, ?)",
+                [(urlhash, url, urlparse(url).netloc, int(completed))
+                 for urlhash, (url, completed) in items])
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def remove(path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+BACKENDS = {
+    "shelve": ShelveBackend,
+    "sqlite": SqliteBackend,
+}
+
+
+class WriteBehindStore(object):
+    ''' Buffers frontier state changes in memory and flushes them in batches.
+
+    A batch is written once `batch_size` changes are buffered or
+    `flush_interval` seconds have passed since the last flush, whichever
+    comes first, so a crash loses at most the batch currently in memory.
+    Reads see buffered changes before they reach the backend. '''
+
+    def __init__(self, backend, batch_size=500, flush_interval=5.0):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = dict()
+        self.lock = RLock()
+        self.last_flush = time.time()
+        self.closed = Event()
+        self.flusher = Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    def __contains__(self, urlhash):
+        with self.lock:
+            return urlhash in self.buffer or urlhash in self.backend
+
+    def __getitem__(self, urlhash):
+        with self.lock:
+            if urlhash in self.buffer:
+                return self.buffer[urlhash]
+            value = self.backend.get(urlhash)
+            if value is None:
+                raise KeyError(urlhash)
+            return value
+
+    def __setitem__(self, urlhash, value):
+        with self.lock:
+            self.buffer[urlhash] = value
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return len(self.backend)
+
+    def values(self):
+        with self.lock:
+            self.flush()
+            return self.backend.values()
+
+    def pending(self):
+        with self.lock:
+            self.flush()
+            return list(self.backend.pending())
+
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                batch, self.buffer = self.buffer, dict()
+                with metrics.timer("store_flush"):
+                    self.backend.write_batch(batch.items())
+            self.last_flush = time.time()
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_interval):
+            if time.time() - self.last_flush >= self.flush_interval:
+                self.flush()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        with self.lock:
+            self.flush()
+            self.backend.close()
@@ -1,17 +1,46 @@
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
-from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.worker import Worker
+from crawler.frontier import Frontier
 
 
-def main(config_file, restart):
+def get_worker_factory(engine):
+    if engine == "async":
+        # Imported here so the thread engine does not need aiohttp.
+        from crawler.async_worker import AsyncWorker
+        return AsyncWorker
+    return Worker
+
+
+def get_frontier_factory(config, node):
+    if node is None:
+        return Frontier
+    assert 0 <= node < len(config.nodes), "--node must index NODES in config.ini"
+    assert config.secret, "SECRET in config.ini must be set to crawl on several nodes"
+    from crawler.distributed import DistributedFrontier
+    config.node_id = node
+    return DistributedFrontier
+
+
+def main(config_file, restart, engine, node, cache_server):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    if cache_server:
+        host, port = cache_server.rsplit(":", 1)
+        config.cache_server = (host, int(port))
+    else:
+        # Imported here so offline runs against a local cache server do not
+        # need spacetime.
+        from utils.server_registration import get_cache_server
+        config.cache_server = get_cache_server(config, restart)
+    crawler = Crawler(
+        config, restart,
+        frontier_factory=get_frontier_factory(config, node),
+        worker_factory=get_worker_factory(engine))
     crawler.start()
 
 
@@ -19,5 +48,13 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument(
+        "--engine", choices=("thread", "async"), default="thread")
+    parser.add_argument(
+        "--node", type=int, default=None,
+        help="Index of this node in NODES, to run one node of a distributed crawl.")
+    parser.add_argument(
+        "--cache_server", type=str, default=None,
+        help="host:port of a cache server to use instead of registering for one.")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.engine, args.node, args.cache_server)
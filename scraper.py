@@ -1,25 +1,38 @@
 from collections import Counter
 import re
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin, urldefrag
+from urllib.parse import urljoin, urldefrag
 from threading import Lock
-from simhash import Simhash, SimhashIndex
-from collections import defaultdict
+from simhash import Simhash
+from utils.extract import extract_links_and_tokens, tokenize, SKIP_TAGS
+from utils.index import build_index
+from utils.neardup import NearDupIndex
+from utils.url_filter import UrlFilter, ACCEPT, is_repeating_path
+from utils.traps import TrapDetector
+from utils.stats import CrawlStats
+from utils.metrics import metrics
+from utils import get_logger, normalize, RateLimitFilter
 import os
 import json
 
-visited_urls = set()
-word_counts = {}
-longest_page_url = ""
-longest_page_word_count = 0
+stats = CrawlStats()
 redirect_count = Counter()
 page_hashes = {}
-index = SimhashIndex([], k=3)
-robots_cache = {}
+index = NearDupIndex(k=3)
+INDEX_FILE = "neardup.bin"
+STATS_FILE = "stats.snapshot"
 output_lock = Lock()
+restore_lock = Lock()
+restored = False
 refresh_count = 0
-php_blacklist = Counter()
-count_blacklist = Counter()
+url_filter = UrlFilter()
+# Per-page errors can come thousands a minute, each code is logged at most
+# 10 times every 10 seconds.
+logger = get_logger("SCRAPER")
+logger.addFilter(RateLimitFilter(burst=10, interval=10.0))
+# New links per path template (digits and ids collapsed) before the
+# template is treated as a trap and cut off.
+traps = TrapDetector(budget=500)
 
 # Default English stopwords list
 stop_words = set([
@@ -80,30 +93,21 @@ def parse_file_and_tokenize(file_path):
         
         return words
 
-def build_inverted_index(file_paths):
+def build_inverted_index(file_paths, index_dir="index", processes=None, memory_mb=256):
     """
-    Build an inverted index from a list of JSON files.
+    Build an on-disk inverted index from a list of JSON files.
+    
+    Files are tokenized across a process pool and inverted in blocks of at
+    most memory_mb, which are merged into index_dir (see utils/index.py).
+    Documents get integer ids in the order of file_paths.
     
     :param file_paths: List of file paths to JSON files containing HTML content
-    :return: Inverted index (dict), with tokens as keys and list of postings as values
+    :param index_dir: Directory the index is written to, replacing any index there
+    :param processes: Tokenizing processes, all cpus by default
+    :param memory_mb: Memory budget of the in-memory block
+    :return: Index metadata (dict) with document, term and token counts
     """
-    inverted_index = defaultdict(list)
-    
-    for file_path in file_paths:
-        tokens = parse_file_and_tokenize(file_path)
-        doc_id = file_path  # Use file path as a document identifier
-        #这边我感觉不太行。他Lecture讲了file path太长可能不适合做id。
-        
-        # Calculate term frequency (TF) for each token in this document
-        term_freq = defaultdict(int)
-        for token in tokens:
-            term_freq[token] += 1
-        
-        # Add postings to the inverted index
-        for token, tf in term_freq.items():
-            inverted_index[token].append({'doc_id': doc_id, 'tf': tf})
-    
-    return inverted_index
+    return build_index(file_paths, index_dir, stop_words, processes, memory_mb)
 
 def handle_response_error(resp):
     """Handle response errors based on status code"""
@@ -114,108 +118,89 @@ def handle_response_error(resp):
     
     # Critical errors that must be handled
     if error_code == 603:  # Invalid scheme
-        print(f"Error 603: URL scheme must be http or https")
+        logger.info(f"Error 603: URL scheme must be http or https", extra={"event": 603})
         return False
     elif error_code == 604:  # Domain not in spec
-        print(f"Error 604: Domain must be within specified domains")
+        logger.info(f"Error 604: Domain must be within specified domains", extra={"event": 604})
         return False
     elif error_code == 605:  # Invalid file extension
-        print(f"Error 605: Invalid file extension detected")
+        logger.info(f"Error 605: Invalid file extension detected", extra={"event": 605})
         return False
     elif error_code == 608:  # Robots.txt denial
-        print(f"Error 608: Access denied by robots.txt")
+        logger.info(f"Error 608: Access denied by robots.txt", extra={"event": 608})
         return False
         
     # Handle other errors we choose to process
     elif error_code == 607:  # Content too big
-        print(f"Error 607: Content exceeds size limit - {resp.headers.get('content-length', 'unknown')} bytes")
+        logger.info(f"Error 607: Content exceeds size limit - {resp.headers.get('content-length', 'unknown')} bytes", extra={"event": 607})
         return False
     elif error_code == 606:  # URL parsing error
-        print(f"Error 606: Cannot parse URL")
+        logger.info(f"Error 606: Cannot parse URL", extra={"event": 606})
         return False
         
     # Ignorable errors
     elif error_code in [600, 601, 602]:  # Request malformed, Download exception, Server failure
-        print(f"Ignorable error {error_code}: Continuing with next URL")
+        logger.info(f"Ignorable error {error_code}: Continuing with next URL", extra={"event": error_code})
         return True
         
     return True
 
 def write_to_output():
-    """Thread-safe function to write stats to output.txt"""
+    """Thread-safe function to write the stats report to output.txt"""
     with output_lock:
         try:
+            stats.merge()
             with open("output.txt", 'w') as f:
-                # Write unique pages count
-                f.write(f"Unique pages: {len(visited_urls)}\n")
-                
-                # Write longest page information
-                f.write(f"Longest page so far: {longest_page_url} with word count: {longest_page_word_count}\n")
-                
-                # Write top 50 words
-                sorted_words = dict(sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:50])
-                f.write(f"Top 50 words: {sorted_words}\n")
-                
-                # Write subdomain statistics
-                subdomains = Counter()
-                for url in visited_urls:
-                    parsed_url = urlparse(url)
-                    if parsed_url.netloc.endswith('.ics.uci.edu'):
-                        subdomains[parsed_url.netloc] += 1
-                
-                for subdomain, count in sorted(subdomains.items()):
-                    f.write(f"{subdomain}, {count}\n")
+                f.write(stats.report())
         except Exception as e:
-            print(f"Error writing to output.txt: {e}")
+            logger.error(f"Error writing to output.txt: {e}", extra={"event": "output"})
 
-def read_from_output():
-    """Read and restore stats from output.txt if it exists"""
-    global word_counts, longest_page_url, longest_page_word_count
-    
-    try:
-        with open('output.txt', 'r') as f:
-            lines = f.readlines()
-            for line in reversed(lines):
-                # Restore word counts
-                if line.startswith("Top 50 words:"):
-                    dict_str = line.replace("Top 50 words: ", "").strip()
-                    word_counts = eval(dict_str)  # Using eval since we know the format is safe
-                
-                # Restore longest page information
-                elif line.startswith("Longest page so far:"):
-                    parts = line.strip().split(' ')
-                    longest_page_url = parts[4]
-                    longest_page_word_count = int(parts[-1])
-                    break
-    except FileNotFoundError:
-        # Initialize with empty values if file doesn't exist
-        word_counts = {}
-        longest_page_word_count = 0
-        longest_page_url = ""
-    except Exception as e:
-        print(f"Error reading from output.txt: {e}")
-        # Initialize with empty values on error
-        word_counts = {}
-        longest_page_word_count = 0
-        longest_page_url = ""
+def checkpoint():
+    """Save statistics and the duplicate index so a restart resumes exactly.
 
+    Does nothing until restore_state has run, so a crawler that never got to
+    scrape a page cannot overwrite the saved state with an empty one.
+    """
+    with output_lock:
+        if not restored:
+            return
+        try:
+            stats.checkpoint(STATS_FILE)
+            index.save(INDEX_FILE)
+        except Exception as e:
+            logger.error(f"Error saving checkpoint: {e}", extra={"event": "checkpoint"})
 
+def restore_state(restart=False):
+    """Restore statistics and the duplicate index saved by an earlier run, once.
 
+    On restart the saved files are deleted instead, so the new crawl neither
+    reports the old one's pages nor takes its seed pages for duplicates.
+    """
+    global restored
+    with restore_lock:
+        if not restored:
+            restored = True
+            if restart:
+                for path in (STATS_FILE, INDEX_FILE):
+                    if os.path.exists(path):
+                        os.remove(path)
+            else:
+                stats.load(STATS_FILE)
+                index.load(INDEX_FILE)
+
+def scraper(url, resp, seen=None, parse=None):
+    """Main scraper function with error handling
 
-def scraper(url, resp, unique_pages, w_counts, longest_url, longest_count):
-    """Main scraper function with error handling"""
-    global longest_page_word_count, longest_page_url, visited_urls, word_counts, refresh_count
+    seen holds urls already discovered by the frontier; links in it are
+    dropped before trap detection counts them.
+
+    parse turns (url, content) into the result of parse_page. It defaults to
+    parse_page itself and can be swapped for one running it in another process.
+    """
+    global refresh_count
     
     # Initialize from existing data
-    if len(visited_urls) == 0:
-        visited_urls = unique_pages
-        read_from_output()
-    if len(word_counts) == 0:
-        word_counts = w_counts
-    if longest_page_url == "":
-        longest_page_url = longest_url
-    if longest_page_word_count == 0:
-        longest_page_word_count = longest_count
+    restore_state()
 
     # Handle response errors
     if not handle_response_error(resp):
@@ -225,183 +210,124 @@ def scraper(url, resp, unique_pages, w_counts, longest_url, longest_count):
     if resp.raw_response and 'content-length' in resp.raw_response.headers:
         content_length = int(resp.raw_response.headers['content-length'])
         if content_length > 10_000_000:  # 10MB limit example
-            print(f"Error 607: Content too large ({content_length} bytes)")
+            logger.info(f"Error 607: Content too large ({content_length} bytes)", extra={"event": 607})
             return []
 
-    links = extract_next_links(url, resp)
-    valid_links = []
+    links = extract_next_links(url, resp, parse or parse_page)
+    with metrics.timer("url_filter"):
+        valid_links = filter_links(links, seen)
     
-    for link in links:
-        try:
-            if is_valid(link):
-                valid_links.append(link)
-        except Exception as e:
-            print(f"Error 606: Exception in parsing URL {link}: {e}")
-            continue
-
-    visited_urls.update(valid_links)
-    
-    # Periodic output update
+    # Periodic checkpoint
     if refresh_count >= 50:
-        write_to_output()
+        with metrics.timer("checkpoint"):
+            checkpoint()
         refresh_count = 0
     else:
         refresh_count += 1
     
     return valid_links
 
-def extract_next_links(url, resp):
-    """Extract links with error handling"""
-    global longest_page_word_count, longest_page_url, word_counts
-    
+def parse_page_soup(url, content):
+    """Links and token counts from a full BeautifulSoup tree.
+
+    Slower than extract_links_and_tokens, kept as the fallback for pages
+    lxml's streaming parser cannot handle.
+    """
+    soup = BeautifulSoup(content, 'lxml')
+
+    # Process text content
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    words = tokenize(soup.get_text(), stop_words)
+
+    # Extract links
     links = []
-    
+    for anchor in soup.find_all('a', href=True):
+        try:
+            abs_url, _ = urldefrag(urljoin(url, anchor['href']))
+            links.append(abs_url)
+        except Exception as e:
+            logger.info(f"Error 606: Failed to parse link {anchor['href']}: {e}", extra={"event": 606})
+            continue
+
+    return links, Counter(words)
+
+def parse_page(url, content):
+    """Parse a page into its links, token counts, word count and simhash.
+
+    Touches no module state so it can run in a separate process.
+    """
+    try:
+        links, counts = extract_links_and_tokens(url, content, stop_words)
+    except Exception:
+        links, counts = parse_page_soup(url, content)
+
+    # Fingerprint the weighted tokens so both parsers agree on it
+    return links, counts, sum(counts.values()), Simhash(counts).value
+
+def extract_next_links(url, resp, parse=parse_page):
+    """Extract links with error handling"""
     try:
         if resp.status == 200 and resp.raw_response and resp.raw_response.content:
-            soup = BeautifulSoup(resp.raw_response.content, 'lxml')
-            
-            # Process text content
-            text_content = soup.get_text().lower()
-            words = [word for word in re.findall(r"\b[a-zA-Z]{2,}\b", text_content) 
-                    if word not in stop_words and not word.isdigit()]
+            with metrics.timer("parse"):
+                links, counts, word_count, fingerprint = parse(url, resp.raw_response.content)
             
             # Duplicate detection
-            current_simhash = Simhash(text_content)
-            if index.get_near_dups(current_simhash):
+            with metrics.timer("dedup"):
+                duplicate = index.check_and_add(fingerprint)
+            if duplicate:
+                metrics.inc("pages_duplicate")
                 return []
-            index.add(url, current_simhash)
             
             # Update statistics
-            if len(words) > longest_page_word_count:
-                longest_page_word_count = len(words)
-                longest_page_url = url
-            
-            for word in words:
-                word_counts[word] = word_counts.get(word, 0) + 1
+            stats.record_page(url, counts, word_count)
             
-            # Extract links
-            for anchor in soup.find_all('a', href=True):
-                try:
-                    abs_url, _ = urldefrag(urljoin(url, anchor['href']))
-                    links.append(abs_url)
-                except Exception as e:
-                    print(f"Error 606: Failed to parse link {anchor['href']}: {e}")
-                    continue
+            return links
                     
     except Exception as e:
-        print(f"Error 601: Exception in processing page {url}: {e}")
+        logger.info(f"Error 601: Exception in processing page {url}: {e}", extra={"event": 601})
         return []
         
-    return links
+    return []
 
 
 def is_valid(url):
-    """Validate URL with comprehensive error handling"""
-    try:
-        parsed = urlparse(url)
-        
-        # Error 603: Check scheme
-        if parsed.scheme not in set(["http", "https"]):
-            print(f"Error 603: Invalid scheme in {url}")
-            return False
-            
-        # Error 604: Check domain
-        netloc_parts = parsed.netloc.split('.')
-        if len(netloc_parts) < 2:
-            print(f"Error 604: Invalid domain format in {url}")
-            return False
-            
-        domain = ".".join(netloc_parts[-2:])
-        allowed_subdomains = ["ics", "cs", "informatics", "stat"]
-        
-        # Special case for today.uci.edu
-        if parsed.netloc == "today.uci.edu":
-            if not parsed.path.startswith("/department/information_computer_sciences/"):
-                print(f"Error 604: Invalid today.uci.edu path in {url}")
-                return False
-            return True
-            
-        # Domain validation
-        if domain != "uci.edu":
-            print(f"Error 604: Domain not allowed: {domain}")
-            return False
-        if len(netloc_parts) > 2 and netloc_parts[-3] not in allowed_subdomains:
-            print(f"Error 604: Subdomain not allowed: {netloc_parts[-3]}")
-            return False
-            
-        # Error 605: Check file extension
-        if re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
-            print(f"Error 605: Invalid file extension in {url}")
-            return False
-            
-        # Additional validations
-        if is_repeating_path(parsed.path):
-            return False
-        
-        if len(parsed.path.split("/")) > 5:
-            return False
-            
-        if re.search(r'\d{4}-\d{2}', url):
-            return False
-            
-        if url in visited_urls:
-            return False
-            
-        if parsed.query.count("%") >= 3 or parsed.query.count("=") >= 3 or parsed.query.count("&") >= 3:
-            return False
-            
-        # Trap detection
-        php_url = url.strip().split(".php")[0] + ".php"
-        if php_blacklist[php_url] > 10:
-            return False
-        php_blacklist[php_url] += 1
-        
-        if count_blacklist[parsed.netloc + parsed.path] > 10:
-            return False
-        count_blacklist[parsed.netloc + parsed.path] += 1
-        
-        return True
-        
-    except Exception as e:
-        print(f"Error 606: Exception in parsing URL {url}: {e}")
-        return False
+    """Validate URL against the crawl rules and trap detection"""
+    return bool(filter_links([url]))
+
 
+def filter_links(links, seen=None):
+    """Links that pass the URL filter and trap detection, in order.
 
-def is_repeating_path(path):
-    segments = path.strip("/").split('/')
-    # Check for a repeating pattern where a segment is followed by itself
-    for i in range(len(segments) - 1):
-        if segments[i] == segments[i + 1]:
-            return True
-    # Use a dictionary to count occurrences of each segment
-    segment_counts = {}
-    for segment in segments:
-        if segment not in segment_counts:
-            segment_counts[segment] = 1
-        else:
-            segment_counts[segment] += 1
-            # If a segment occurs more than 3 times, it's likely a trap
-            if segment_counts[segment] >= 3:
-                return True
-    return False
+    Links are normalized as the frontier stores them and deduplicated first,
+    so a link already seen, or repeated on the page, is not counted again
+    against its path template.
+    """
+    links = list(dict.fromkeys(normalize(link) for link in links))
+    return [link for link, reason in zip(links, url_filter.check_many(links, seen))
+            if reason == ACCEPT and traps.allow(link)]
 
 def print_statistics():
     """Print current statistics and write to output file"""
     print("\nCrawler Statistics:")
-    print(f"Total unique pages visited: {len(visited_urls)}")
+    stats.merge()
+    longest_page_url, longest_page_word_count = stats.longest_page()
+    print(f"Total unique pages visited: {stats.unique_pages()}")
     print(f"URL of the longest page: {longest_page_url}")
     print(f"Word count of the longest page: {longest_page_word_count}")
     print("Top 10 most frequent words:")
-    for word, count in list(word_counts.items())[:10]:
+    for word, count in stats.top_words(10):
         print(f"{word}: {count}")
+    print("URL filter results:")
+    for reason, count in url_filter.counts.most_common():
+        print(f"{reason}: {count}")
+    print("Path patterns cut off as traps:")
+    for template, count in traps.report(10):
+        print(f"{template}: {count} urls")
+    dedup = index.stats()
+    print(f"Near duplicates suppressed: {dedup['suppressed']} of {dedup['checked']} pages "
+          f"(p50 {dedup['p50_ms']:.3f} ms, p99 {dedup['p99_ms']:.3f} ms)")
     
-    # Write current stats to output.txt
+    # Save and write current stats to output.txt
+    checkpoint()
     write_to_output()
@@ -1,33 +1,150 @@
+import atexit
 import os
 import logging
-from hashlib import sha256
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from hashlib import sha256, blake2b
+from threading import Lock
 from urllib.parse import urlparse
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Records from every logger go through this queue to one listener thread,
+# which does all the formatting and file/console writes.
+_log_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = Lock()
+
+
+class _LogFile(logging.Filter):
+    ''' Tags records with the Logs/ file they are written to. '''
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def filter(self, record):
+        record.logfile = self.filename
+        return True
+
+
+class _FileRouter(logging.Handler):
+    ''' Writes each record to Logs/<record.logfile>.log, opening the files
+    as they are first needed. Only used by the listener thread. '''
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.files = dict()
+
+    def emit(self, record):
+        handler = self.files.get(record.logfile)
+        if handler is None:
+            handler = logging.FileHandler(f"Logs/{record.logfile}.log")
+            handler.setFormatter(self.formatter)
+            self.files[record.logfile] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            console = logging.StreamHandler()
+            console.setLevel(logging.INFO)
+            console.setFormatter(logging.Formatter(LOG_FORMAT))
+            _listener = QueueListener(
+                _log_queue, _FileRouter(), console, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+
+
 def get_logger(name, filename=None):
+    ''' Logger writing to Logs/<filename or name>.log and the console.
+
+    Records are only queued by the calling thread; a background listener
+    writes them. Calling it again for the same name returns the same logger
+    without adding handlers. '''
     logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.INFO)
     if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+        os.makedirs("Logs", exist_ok=True)
+    logger.addFilter(_LogFile(filename if filename else name))
+    logger.addHandler(QueueHandler(_log_queue))
+    _start_listener()
     return logger
 
 
-def get_urlhash(url):
+def flush_logs():
+    ''' Block until every record queued so far has been written. '''
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+class RateLimitFilter(logging.Filter):
+    ''' Lets through at most `burst` records per `interval` seconds for each
+    event, the record's `event` extra or else its logger name. The first
+    record let through after some were dropped says how many. '''
+
+    def __init__(self, burst=10, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.windows = dict()  # event -> [window start, passed, dropped]
+        self.lock = Lock()
+
+    def filter(self, record):
+        event = getattr(record, "event", record.name)
+        with self.lock:
+            window = self.windows.get(event)
+            if window is None or record.created - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                window = self.windows[event] = [record.created, 0, 0]
+                if dropped:
+                    record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def _restart_listener():
+    # A forked child gets a copy of the queue but not the listener thread.
+    global _listener, _listener_lock
+    _listener_lock = Lock()
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _urlkey(url):
     parsed = urlparse(url)
     # everything other than scheme.
-    return sha256(
+    return (
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8"))
+
+
+def get_urlhash(url):
+    return sha256(_urlkey(url)).hexdigest()
+
+
+def get_urldigest(url):
+    # 64 bit fingerprint of the same fields as get_urlhash, for compact sets.
+    return int.from_bytes(blake2b(_urlkey(url), digest_size=8).digest(), "big")
 
 def normalize(url):
     if url.endswith("/"):
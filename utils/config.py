@@ -1,3 +1,4 @@
+import os
 import re
 
 
@@ -8,12 +9,45 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", os.cpu_count() or 1))
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.store = config["LOCAL PROPERTIES"].get("STORE", "shelve").strip()
+        assert self.store in {"shelve", "sqlite"}, "STORE should be shelve or sqlite"
+        self.flush_batch = int(config["LOCAL PROPERTIES"].get("FLUSHBATCH", 500))
+        self.flush_interval = float(config["LOCAL PROPERTIES"].get("FLUSHINTERVAL", 5))
+        self.seen_capacity = int(config["LOCAL PROPERTIES"].get("SEENCAPACITY", 1000000))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.connect_timeout = float(config["CONNECTION"].get("CONNECTTIMEOUT", 5))
+        self.read_timeout = float(config["CONNECTION"].get("READTIMEOUT", 30))
+        self.retries = int(config["CONNECTION"].get("RETRIES", 3))
+        self.backoff = float(config["CONNECTION"].get("BACKOFF", 0.5))
+        self.fetch_deadline = float(config["CONNECTION"].get("FETCHDEADLINE", 60))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.max_delay = float(config["CRAWLER"].get("MAXDELAY", 30))
+        assert self.max_delay >= self.time_delay > 0, "MAXDELAY should be at least POLITENESS, which should be above 0"
+        self.scorer = config["CRAWLER"].get("SCORER", "depth")
+        self.max_queued_per_host = int(config["CRAWLER"].get("MAXQUEUEDPERHOST", 50000))
+        self.async_concurrency = int(config["CRAWLER"].get("ASYNCCONCURRENCY", 100))
+        self.max_attempts = int(config["CRAWLER"].get("MAXATTEMPTS", 3))
+        self.retry_delay = float(config["CRAWLER"].get("RETRYDELAY", 30))
+        self.robots = config.getboolean("CRAWLER", "ROBOTS", fallback=True)
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", 86400))
+
+        distributed = config["DISTRIBUTED"] if config.has_section("DISTRIBUTED") else {}
+        self.nodes = [node for node in distributed.get("NODES", "").split(",") if node.strip()]
+        self.node_id = None
+        self.forward_batch = int(distributed.get("FORWARDBATCH", 100))
+        self.forward_interval = float(distributed.get("FORWARDINTERVAL", 1))
+        self.idle_timeout = float(distributed.get("IDLETIMEOUT", 60))
+        self.secret = distributed.get("SECRET", "").strip()
+
+        metrics = config["METRICS"] if config.has_section("METRICS") else {}
+        self.metrics = config.getboolean("METRICS", "ENABLED", fallback=False)
+        self.metrics_interval = float(metrics.get("DUMPINTERVAL", 60))
+        self.metrics_port = int(metrics.get("PORT", 0))
 
         self.cache_server = None
\ No newline at end of file
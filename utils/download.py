@@ -1,17 +1,111 @@
 import requests
 import cbor
 import time
+from threading import Lock
 
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import metrics
 from utils.response import Response
 
-def download(url, config, logger=None):
+_sessions = dict()
+_sessions_lock = Lock()
+
+# Bytes read from the cache server between deadline checks.
+CHUNK_SIZE = 16 * 1024
+
+# Cache server statuses worth retrying, as opposed to answers about the url.
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+
+class DownloadError(Exception):
+    ''' The cache server could not be reached, or did not answer before the
+    url's deadline. The url can be tried again later. '''
+
+
+def get_session(config):
+    ''' Shared keep-alive session for the config's cache server.
+
+    Sessions are created once per cache server and keep one connection per
+    worker thread alive; other callers, such as robots.txt fetches, get an
+    extra connection rather than waiting for one. They do not retry on their
+    own: download retries within the url's deadline. '''
+    key = tuple(config.cache_server)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=config.threads_count)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def _deadline_error(url, config):
+    return DownloadError(f"Deadline of {config.fetch_deadline}s exceeded for {url}.")
+
+
+def _fetch(session, url, config, deadline):
+    ''' (response, body) of one attempt at url, no socket wait outliving the
+    deadline by more than one read. '''
     host, port = config.cache_server
-    resp = requests.get(
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise _deadline_error(url, config)
+    resp = session.get(
         f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+        timeout=(min(config.connect_timeout, remaining),
+                 min(config.read_timeout, remaining)),
+        stream=True)
+    with resp:
+        if resp.status_code in RETRY_STATUSES:
+            return resp, None
+        content = bytearray()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            content += chunk
+            if time.time() > deadline:
+                raise _deadline_error(url, config)
+    return resp, content
+
+
+def download(url, config, logger=None):
+    ''' Fetch url through the cache server.
+
+    Each connect and socket read is bounded by CONNECTTIMEOUT/READTIMEOUT,
+    cut down to the time left, and the whole fetch by FETCHDEADLINE seconds.
+    Connection errors, timeouts and 5xx from the cache server itself are
+    retried up to RETRIES times with exponential backoff (BACKOFF * 2 **
+    attempt) while the deadline allows; DownloadError is raised once it is
+    exceeded or the retries run out. '''
+    deadline = time.time() + config.fetch_deadline
+    session = get_session(config)
+    attempt = 0
+    while True:
+        try:
+            resp, content = _fetch(session, url, config, deadline)
+            if content is not None or attempt == config.retries:
+                break
+            error = DownloadError(
+                f"Cache server answered {resp.status_code} fetching {url}.")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == config.retries:
+                raise DownloadError(f"{type(e).__name__} fetching {url}: {e}") from e
+            error = DownloadError(f"{type(e).__name__} fetching {url}: {e}")
+        except requests.RequestException as e:
+            raise DownloadError(f"{type(e).__name__} fetching {url}: {e}") from e
+        pause = config.backoff * 2 ** attempt
+        if time.time() + pause >= deadline:
+            raise error
+        time.sleep(pause)
+        attempt += 1
+    if time.time() > deadline:
+        raise _deadline_error(url, config)
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        if resp and content:
+            with metrics.timer("decode"):
+                return Response(cbor.loads(content))
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import aiohttp
+import cbor
+
+from utils.download import DownloadError, RETRY_STATUSES
+from utils.metrics import metrics
+from utils.response import Response
+
+
+def make_session(config, limit):
+    ''' aiohttp session keeping up to `limit` keep-alive connections open to
+    the cache server. download_async gives each request the time left
+    before its url's deadline; these are the defaults for other requests. '''
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=limit),
+        timeout=aiohttp.ClientTimeout(
+            total=config.fetch_deadline,
+            sock_connect=config.connect_timeout,
+            sock_read=config.read_timeout))
+
+
+async def _fetch_async(session, url, config, deadline):
+    ''' (status, body) of one attempt at url, body None for a status worth
+    retrying. No attempt outlives the deadline. '''
+    host, port = config.cache_server
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise asyncio.TimeoutError
+    async with session.get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+            timeout=aiohttp.ClientTimeout(
+                total=remaining,
+                sock_connect=min(config.connect_timeout, remaining),
+                sock_read=min(config.read_timeout, remaining))) as resp:
+        if resp.status in RETRY_STATUSES:
+            return resp.status, None
+        return resp.status, await resp.read()
+
+
+async def download_async(url, config, session, logger=None):
+    ''' Async counterpart of utils.download.download, with the same
+    deadline and the same retries and backoff. '''
+    deadline = time.time() + config.fetch_deadline
+    attempt = 0
+    while True:
+        try:
+            status, content = await _fetch_async(session, url, config, deadline)
+            if content is not None or attempt == config.retries:
+                break
+            error = DownloadError(f"Cache server answered {status} fetching {url}.")
+        except asyncio.TimeoutError as e:
+            if time.time() >= deadline:
+                raise DownloadError(
+                    f"Deadline of {config.fetch_deadline}s exceeded for {url}.") from e
+            if attempt == config.retries:
+                raise DownloadError(f"Timeout fetching {url}.") from e
+            error = DownloadError(f"Timeout fetching {url}.")
+        except aiohttp.ClientConnectionError as e:
+            if attempt == config.retries:
+                raise DownloadError(f"{type(e).__name__} fetching {url}: {e}") from e
+            error = DownloadError(f"{type(e).__name__} fetching {url}: {e}")
+        except aiohttp.ClientError as e:
+            raise DownloadError(f"{type(e).__name__} fetching {url}: {e}") from e
+        pause = config.backoff * 2 ** attempt
+        if time.time() + pause >= deadline:
+            raise error
+        await asyncio.sleep(pause)
+        attempt += 1
+    try:
+        if content:
+            with metrics.timer("decode"):
+                return Response(cbor.loads(content))
+    except (EOFError, ValueError) as e:
+        pass
+    logger.error(f"Spacetime Response error {status} with url {url}.")
+    return Response({
+        "error": f"Spacetime Response error {status} with url {url}.",
+        "status": status,
+        "url": url})
@@ -0,0 +1,86 @@
+import re
+from collections import Counter
+from urllib.parse import urljoin, urldefrag
+
+from lxml import etree
+
+WORD_RE = re.compile(r"\b[a-zA-Z]{2,}\b")
+
+# Text under these tags is not visible and is not tokenized.
+SKIP_TAGS = {"script", "style", "noscript", "template"}
+
+# Bytes handed to the parser per feed, and characters of text buffered
+# before they are tokenized, so memory stays bounded on huge pages.
+FEED_SIZE = 64 * 1024
+TEXT_BUFFER = 64 * 1024
+
+
+def tokenize(text, stop_words):
+    return [word for word in WORD_RE.findall(text.lower())
+            if word not in stop_words and not word.isdigit()]
+
+
+class _LinkTextTarget(object):
+    ''' lxml parser target collecting <a href> links and visible text tokens
+    as the parser streams events, without building a tree. '''
+
+    def __init__(self, url, stop_words):
+        self.url = url
+        self.stop_words = stop_words
+        self.links = list()
+        self.counts = Counter()
+        self.skip_depth = 0
+        self.text = list()
+        self.text_size = 0
+
+    def start(self, tag, attrib):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                try:
+                    self.links.append(urldefrag(urljoin(self.url, href))[0])
+                except ValueError:
+                    pass
+
+    def end(self, tag):
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if self.skip_depth:
+            return
+        self.text.append(data)
+        self.text_size += len(data)
+        if self.text_size >= TEXT_BUFFER:
+            self._tokenize(final=False)
+
+    def comment(self, text):
+        pass
+
+    def _tokenize(self, final):
+        text = "".join(self.text)
+        rest = ""
+        if not final:
+            # Keep the trailing partial word for the next chunk.
+            cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"))
+            if cut != -1:
+                text, rest = text[:cut], text[cut:]
+        self.counts.update(tokenize(text, self.stop_words))
+        self.text = [rest] if rest else list()
+        self.text_size = len(rest)
+
+    def close(self):
+        self._tokenize(final=True)
+        return self.links, self.counts
+
+
+def extract_links_and_tokens(url, content, stop_words):
+    ''' Absolute, defragmented links and a Counter of text tokens from an
+    html page, in one streaming pass. Raises if lxml cannot parse it. '''
+    parser = etree.HTMLParser(target=_LinkTextTarget(url, stop_words))
+    view = memoryview(content)
+    for start in range(0, len(view), FEED_SIZE):
+        parser.feed(bytes(view[start:start + FEED_SIZE]))
+    return parser.close()
@@ -0,0 +1,280 @@
+''' On-disk inverted index over a corpus of crawled JSON pages.
+
+build_index tokenizes the pages on a process pool and inverts them SPIMI
+style: postings accumulate in memory until `memory_mb` is reached, are
+written out as a sorted block, and the blocks are k-way merged into the
+final index once every page is read. An index directory holds
+
+    meta.json     document, term and token counts
+    docs.bin      DOC_RECORD per doc id: offset and length of its url in
+                  urls.bin, and its length in tokens
+    urls.bin      utf-8 urls, back to back
+    lexicon.bin   TERM_RECORD per term in sorted order: offset and length
+                  of the term in terms.bin, document frequency, offset and
+                  length of its postings in postings.bin
+    terms.bin     utf-8 terms, back to back
+    postings.bin  per term, varint encoded (doc id gap, tf) pairs
+
+    python -m utils.index CORPUS_DIR [--index_dir index] [--processes N]
+        [--memory_mb MB]
+'''
+import heapq
+import json
+import os
+import shutil
+import struct
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+
+from utils.extract import extract_links_and_tokens
+
+DOC_RECORD = struct.Struct("<QII")
+TERM_RECORD = struct.Struct("<QIIQI")
+# Header of each term in a block file: term length, df, last doc id and
+# postings length.
+BLOCK_RECORD = struct.Struct("<IIII")
+# Everything an index directory may hold, finished or not.
+INDEX_FILES = frozenset((
+    "meta.json", "docs.bin", "urls.bin", "lexicon.bin", "terms.bin",
+    "postings.bin", "blocks"))
+
+# Rough bytes held per buffered posting and per distinct term of a block.
+POSTING_BYTES = 8
+TERM_BYTES = 120
+
+# Files handed to a pool process at a time.
+CHUNK_SIZE = 32
+
+
+def encode_varints(values):
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return out
+
+
+def decode_varint(buf, pos):
+    ''' (value, position after it) of the varint at buf[pos]. '''
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def decode_varints(buf):
+    values = []
+    value = shift = 0
+    for byte in buf:
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            values.append(value)
+            value = shift = 0
+        else:
+            shift += 7
+    return values
+
+
+def encode_postings(postings):
+    ''' Varint (gap, tf) pairs of an array of interleaved doc ids and tfs,
+    the first doc id counted from 0. '''
+    values = array("I", postings)
+    for i in range(len(values) - 2, 0, -2):
+        values[i] -= values[i - 2]
+    return encode_varints(values)
+
+
+def tokenize_file(path, stop_words):
+    ''' (url, token counts) of one crawled page, None if it is unreadable. '''
+    try:
+        with open(path, encoding="utf-8") as f:
+            page = json.load(f)
+        url = page.get("url") or path
+        _, counts = extract_links_and_tokens(
+            url, page.get("content", "").encode("utf-8"), stop_words)
+        return url, counts
+    except Exception:
+        return None
+
+
+def tokenize_files(paths, stop_words):
+    return [tokenize_file(path, stop_words) for path in paths]
+
+
+def _read_block(path, number):
+    ''' (term, block number, df, last doc id, postings) of every term in a
+    block file, in term order, read as the merge goes. '''
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(BLOCK_RECORD.size)
+            if not header:
+                return
+            term_size, df, last, size = BLOCK_RECORD.unpack(header)
+            term = f.read(term_size).decode("utf-8")
+            yield term, number, df, last, f.read(size)
+
+
+class IndexBuilder(object):
+    ''' Inverts documents added in doc id order into index_dir. '''
+
+    def __init__(self, index_dir, memory_mb=256):
+        self.index_dir = index_dir
+        self.budget = memory_mb * 1024 * 1024
+        self.block_dir = os.path.join(index_dir, "blocks")
+        os.makedirs(self.block_dir, exist_ok=True)
+        self.blocks = list()
+        self.block = dict()  # term -> array of interleaved doc ids and tfs
+        self.block_bytes = 0
+        self.docs = 0
+        self.tokens = 0
+        self.urls = open(os.path.join(index_dir, "urls.bin"), "wb")
+        self.doc_table = open(os.path.join(index_dir, "docs.bin"), "wb")
+        self.url_offset = 0
+
+    def add(self, url, counts):
+        ''' Add one document; returns its doc id. '''
+        doc_id = self.docs
+        self.docs += 1
+        encoded = url.encode("utf-8")
+        length = sum(counts.values())
+        self.urls.write(encoded)
+        self.doc_table.write(DOC_RECORD.pack(self.url_offset, len(encoded), length))
+        self.url_offset += len(encoded)
+        self.tokens += length
+        for term, tf in counts.items():
+            postings = self.block.get(term)
+            if postings is None:
+                postings = self.block[term] = array("I")
+                self.block_bytes += TERM_BYTES
+            postings.append(doc_id)
+            postings.append(tf)
+            self.block_bytes += POSTING_BYTES
+        if self.block_bytes >= self.budget:
+            self._write_block()
+        return doc_id
+
+    def _write_block(self):
+        if not self.block:
+            return
+        path = os.path.join(self.block_dir, f"block-{len(self.blocks):05d}.bin")
+        with open(path, "wb") as f:
+            for term in sorted(self.block):
+                postings = self.block[term]
+                encoded_term = term.encode("utf-8")
+                encoded = encode_postings(postings)
+                f.write(BLOCK_RECORD.pack(
+                    len(encoded_term), len(postings) // 2, postings[-2], len(encoded)))
+                f.write(encoded_term)
+                f.write(encoded)
+        self.blocks.append(path)
+        self.block = dict()
+        self.block_bytes = 0
+
+    def finish(self):
+        ''' Merge the blocks into the final index and return its meta. '''
+        self._write_block()
+        self.urls.close()
+        self.doc_table.close()
+        terms = 0
+        term_offset = postings_offset = 0
+        with open(os.path.join(self.index_dir, "lexicon.bin"), "wb") as lexicon, \
+                open(os.path.join(self.index_dir, "terms.bin"), "wb") as term_file, \
+                open(os.path.join(self.index_dir, "postings.bin"), "wb") as postings_file:
+            merged = heapq.merge(*(
+                _read_block(path, number) for number, path in enumerate(self.blocks)))
+            for term, group in groupby(merged, key=itemgetter(0)):
+                df = last = 0
+                parts = list()
+                for _, _, block_df, block_last, postings in group:
+                    if parts:
+                        # Blocks hold increasing doc ids, so only the first
+                        # gap of this block's postings needs re-basing.
+                        first, pos = decode_varint(postings, 0)
+                        parts.append(encode_varints((first - last,)))
+                        parts.append(postings[pos:])
+                    else:
+                        parts.append(postings)
+                    df += block_df
+                    last = block_last
+                encoded_term = term.encode("utf-8")
+                size = sum(len(part) for part in parts)
+                lexicon.write(TERM_RECORD.pack(
+                    term_offset, len(encoded_term), df, postings_offset, size))
+                term_file.write(encoded_term)
+                postings_file.writelines(parts)
+                term_offset += len(encoded_term)
+                postings_offset += size
+                terms += 1
+        shutil.rmtree(self.block_dir)
+        meta = {"docs": self.docs, "terms": terms, "tokens": self.tokens,
+                "blocks": len(self.blocks)}
+        with open(os.path.join(self.index_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return meta
+
+
+def _tokenized(chunks, tokenize, processes):
+    ''' tokenize(chunk) for every chunk, in order, keeping a few chunks in
+    flight so results never pile up ahead of the inverter. '''
+    if processes == 1:
+        yield from map(tokenize, chunks)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(tokenize, chunk))
+            if len(in_flight) >= processes * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def build_index(file_paths, index_dir, stop_words, processes=None, memory_mb=256):
+    ''' Index the crawled JSON pages at file_paths into index_dir, doc ids
+    following the order of file_paths. Pages are tokenized on `processes`
+    processes, all cpus by default and this process alone if 1. Unreadable
+    pages are skipped. An index already in index_dir is replaced; a
+    directory holding anything else is left alone and ValueError raised. '''
+    if os.path.exists(index_dir):
+        if not set(os.listdir(index_dir)) <= INDEX_FILES:
+            raise ValueError(f"{index_dir} is not an index, refusing to replace it.")
+        shutil.rmtree(index_dir)
+    builder = IndexBuilder(index_dir, memory_mb)
+    chunks = (file_paths[start:start + CHUNK_SIZE]
+              for start in range(0, len(file_paths), CHUNK_SIZE))
+    tokenize = partial(tokenize_files, stop_words=stop_words)
+    for pages in _tokenized(chunks, tokenize, processes or os.cpu_count() or 1):
+        for page in pages:
+            if page is not None:
+                builder.add(*page)
+    return builder.finish()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    from scraper import get_all_file_paths, stop_words
+
+    parser = ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--index_dir", type=str, default="index")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--memory_mb", type=int, default=256)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    meta = build_index(
+        get_all_file_paths(args.corpus), args.index_dir, stop_words,
+        args.processes, args.memory_mb)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {meta['docs']} docs, {meta['terms']} terms from {meta['blocks']} "
+          f"blocks in {elapsed:.1f}s ({meta['docs'] / elapsed:.0f} docs/s)")
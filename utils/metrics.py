@@ -0,0 +1,202 @@
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+# Upper bounds, in seconds, of the stage timing histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+PREFIX = "crawler"
+
+
+class _NullTimer(object):
+    ''' Timer handed out while metrics are disabled; does nothing. '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(object):
+    ''' Counts of observations per bucket of BUCKETS, with their sum. '''
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def quantile(self, q):
+        ''' Upper bound of the bucket holding the q-th quantile. '''
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0.0
+
+
+class Metrics(object):
+    ''' Stage timings, counters and gauges for the crawl loop.
+
+    Disabled until enable() is called; until then timer() hands out a shared
+    no-op context manager and observe()/inc() return straight away, so
+    instrumented code pays one attribute check per call. Gauges are
+    callables read only when a report is produced. '''
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = Lock()
+        self.histograms = dict()  # stage -> Histogram
+        self.counters = dict()    # name -> count
+        self.gauges = dict()      # name -> callable returning the value
+        self.started = time.time()
+        self.last_dump = (self.started, dict())
+        self.server = None
+
+    def enable(self):
+        self.enabled = True
+        self.started = time.time()
+        self.last_dump = (self.started, dict())
+
+    def timer(self, stage):
+        ''' Context manager recording the time spent in its block as stage. '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def _read_gauges(self):
+        values = dict()
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                continue
+        return values
+
+    def render(self):
+        ''' Everything recorded so far, in Prometheus text format. '''
+        with self.lock:
+            histograms = {
+                stage: (list(h.counts), h.total, h.sum)
+                for stage, h in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = []
+        if histograms:
+            lines.append(f"# TYPE {PREFIX}_stage_seconds histogram")
+        for stage, (counts, total, seconds) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {seconds}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {total}')
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        ''' One line per stage with its count, mean and p50/p99, then counter
+        rates since the previous summary and the gauges. '''
+        now = time.time()
+        with self.lock:
+            stages = [
+                f"{stage}: n={h.total} mean={h.sum / h.total * 1000:.1f}ms "
+                f"p50<={h.quantile(0.5) * 1000:.1f}ms p99<={h.quantile(0.99) * 1000:.1f}ms"
+                for stage, h in sorted(self.histograms.items()) if h.total]
+            counters = dict(self.counters)
+        since, previous = self.last_dump
+        self.last_dump = (now, counters)
+        elapsed = max(now - since, 1e-9)
+        rates = [
+            f"{name}={value} ({(value - previous.get(name, 0)) / elapsed:.2f}/s)"
+            for name, value in sorted(counters.items())]
+        gauges = [f"{name}={value}" for name, value in sorted(self._read_gauges().items())]
+        return "\n".join(stages + [" ".join(rates), " ".join(gauges)])
+
+    def start(self, logger, interval=60, port=0):
+        ''' Log a summary every `interval` seconds, and serve render() at
+        http://127.0.0.1:port/metrics if port is set. '''
+        if interval > 0:
+            def dump_periodically():
+                while True:
+                    time.sleep(interval)
+                    logger.info(f"Metrics\n{self.summary()}")
+            Thread(target=dump_periodically, daemon=True).start()
+        if port:
+            metrics = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+            self.server.daemon_threads = True
+            Thread(target=self.server.serve_forever, daemon=True).start()
+            logger.info(f"Serving metrics at http://127.0.0.1:{port}/metrics")
+
+
+# Shared by the whole process, enabled by Crawler when METRICS is set.
+metrics = Metrics()
@@ -0,0 +1,117 @@
+import os
+import struct
+import time
+from array import array
+from collections import deque
+from threading import Lock
+
+
+class NearDupIndex(object):
+    ''' Thread-safe simhash index answering "is there a stored fingerprint
+    within k bits of this one".
+
+    Fingerprints are split into k + 1 bands; by pigeonhole any fingerprint
+    within k bits shares at least one band exactly, so each band is a table
+    from band value to the fingerprints holding it and a query only compares
+    against those candidates. At most `capacity` fingerprints are kept, the
+    oldest being evicted first. '''
+
+    def __init__(self, k=3, bits=64, capacity=500000, latency_samples=10000):
+        self.k = k
+        self.capacity = capacity
+        self.bands = k + 1
+        self.band_bits = bits // self.bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.tables = [dict() for _ in range(self.bands)]
+        self.fingerprints = deque()
+        self.lock = Lock()
+        self.checked = 0
+        self.suppressed = 0
+        self.latencies = deque(maxlen=latency_samples)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def _keys(self, fingerprint):
+        for band in range(self.bands):
+            yield (fingerprint >> (band * self.band_bits)) & self.band_mask
+
+    def _is_near_dup(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            for other in table.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.k:
+                    return True
+        return False
+
+    def _add(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            table.setdefault(key, []).append(fingerprint)
+        self.fingerprints.append(fingerprint)
+        if len(self.fingerprints) > self.capacity:
+            self._evict(self.fingerprints.popleft())
+
+    def _evict(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            bucket = table[key]
+            bucket.remove(fingerprint)
+            if not bucket:
+                del table[key]
+
+    def check_and_add(self, fingerprint):
+        ''' True if fingerprint is a near duplicate of a stored one,
+        otherwise store it and return False. '''
+        return self.check_and_add_many([fingerprint])[0]
+
+    def check_and_add_many(self, fingerprints):
+        ''' check_and_add over a batch under one lock acquisition. Later
+        fingerprints in the batch are also checked against earlier ones. '''
+        results = []
+        with self.lock:
+            for fingerprint in fingerprints:
+                start = time.perf_counter()
+                duplicate = self._is_near_dup(fingerprint)
+                if not duplicate:
+                    self._add(fingerprint)
+                self.latencies.append(time.perf_counter() - start)
+                results.append(duplicate)
+            self.checked += len(fingerprints)
+            self.suppressed += sum(results)
+        return results
+
+    def stats(self):
+        ''' Pages checked and suppressed, and query latency percentiles in
+        milliseconds over the most recent checks. '''
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "checked": self.checked,
+                "suppressed": self.suppressed,
+                "size": len(self.fingerprints)}
+        for pct in (50, 90, 99):
+            stats[f"p{pct}_ms"] = (
+                latencies[min(len(latencies) - 1, len(latencies) * pct // 100)] * 1000
+                if latencies else 0.0)
+        return stats
+
+    def save(self, path):
+        with self.lock:
+            fingerprints = array("Q", self.fingerprints)
+            checked, suppressed = self.checked, self.suppressed
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(struct.pack("<QQQ", len(fingerprints), checked, suppressed))
+            fingerprints.tofile(f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        ''' Restore a saved index, if the file exists. '''
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            count, checked, suppressed = struct.unpack("<QQQ", f.read(24))
+            fingerprints = array("Q")
+            fingerprints.fromfile(f, count)
+        with self.lock:
+            for fingerprint in fingerprints:
+                self._add(fingerprint)
+            self.checked, self.suppressed = checked, suppressed
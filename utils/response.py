@@ -1,14 +1,47 @@
 import pickle
 
+_UNDECODED = object()
+
+
 class Response(object):
+    ''' A cache server response.
+
+    The pickled requests.Response in the payload is kept as a memoryview
+    over the decoded cbor bytes and only unpickled the first time
+    raw_response (or content/headers) is read, so responses that are never
+    scraped skip the unpickling altogether. '''
+
+    __slots__ = ("url", "status", "error", "_payload", "_raw_response")
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        payload = resp_dict.get("response")
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            self._payload = memoryview(payload)
+            self._raw_response = _UNDECODED
+        else:
+            self._payload = None
+            self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if self._raw_response is _UNDECODED:
+            try:
+                self._raw_response = pickle.loads(self._payload)
+            except (TypeError, pickle.UnpicklingError, EOFError):
+                self._raw_response = None
+            self._payload = None
+        return self._raw_response
+
+    @property
+    def content(self):
+        ''' Body bytes of the page, None if there is no page. '''
+        raw = self.raw_response
+        return raw.content if raw is not None else None
+
+    @property
+    def headers(self):
+        raw = self.raw_response
+        return raw.headers if raw is not None else {}
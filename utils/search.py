@@ -0,0 +1,170 @@
+''' Ranked queries over an index built by utils.index.
+
+The index files are memory mapped: terms are found by binary search over
+the fixed width lexicon records, and a term's postings are only decoded
+when a query uses it, the `cache_size` most recently used lists being kept
+decoded. Queries are scored document at a time with BM25 (or tf-idf),
+keeping the top k in a heap.
+
+    python -m utils.search INDEX_DIR [--k 10] [--scoring bm25|tfidf]
+'''
+import json
+import math
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from heapq import heappush, heappop, heapreplace
+from itertools import accumulate
+from threading import Lock
+
+from utils.extract import tokenize
+from utils.index import DOC_RECORD, TERM_RECORD, decode_varints
+
+
+def _map(path):
+    ''' Read-only map of the file at path; an empty file maps to b"". '''
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SearchEngine(object):
+    ''' Thread-safe reader of the index in index_dir. '''
+
+    def __init__(self, index_dir, stop_words=frozenset(), cache_size=256,
+                 k1=1.2, b=0.75):
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.stop_words = stop_words
+        self.cache_size = cache_size
+        self.k1 = k1
+        self.b = b
+        self.docs = meta["docs"]
+        self.term_count = meta["terms"]
+        self.average_length = meta["tokens"] / self.docs if self.docs else 0
+        self.lexicon = _map(os.path.join(index_dir, "lexicon.bin"))
+        self.terms = _map(os.path.join(index_dir, "terms.bin"))
+        self.postings_file = _map(os.path.join(index_dir, "postings.bin"))
+        self.doc_table = _map(os.path.join(index_dir, "docs.bin"))
+        self.urls = _map(os.path.join(index_dir, "urls.bin"))
+        self.lengths = array("I", (
+            length for _, _, length in DOC_RECORD.iter_unpack(self.doc_table)))
+        self.cache = OrderedDict()  # term -> (df, doc ids, tfs)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, term):
+        ''' (df, postings offset, postings length) of term, None if absent. '''
+        key = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, term_length, df, offset, length = TERM_RECORD.unpack_from(
+                self.lexicon, middle * TERM_RECORD.size)
+            found = self.terms[term_offset:term_offset + term_length]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return df, offset, length
+        return None
+
+    def postings(self, term):
+        ''' (df, doc ids, tfs) of term, None if no document has it. '''
+        with self.lock:
+            cached = self.cache.get(term)
+            if cached is not None:
+                self.cache.move_to_end(term)
+                self.hits += 1
+                return cached
+        record = self._lookup(term)
+        if record is None:
+            return None
+        df, offset, length = record
+        values = decode_varints(self.postings_file[offset:offset + length])
+        postings = (df, array("I", accumulate(values[0::2])), array("I", values[1::2]))
+        with self.lock:
+            self.misses += 1
+            self.cache[term] = postings
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return postings
+
+    def url(self, doc_id):
+        offset, length, _ = DOC_RECORD.unpack_from(self.doc_table, doc_id * DOC_RECORD.size)
+        return self.urls[offset:offset + length].decode("utf-8")
+
+    def _weights(self, df, scoring):
+        if scoring == "tfidf":
+            idf = math.log(self.docs / df)
+            return lambda doc, tf: (1 + math.log(tf)) * idf
+        idf = math.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+        k1, b, average = self.k1, self.b, self.average_length or 1
+        lengths = self.lengths
+        return lambda doc, tf: idf * tf * (k1 + 1) / (
+            tf + k1 * (1 - b + b * lengths[doc] / average))
+
+    def search(self, query, k=10, scoring="bm25"):
+        ''' [(url, score)] of the k best documents for query, best first. '''
+        lists = list()
+        for term in dict.fromkeys(tokenize(query, self.stop_words)):
+            postings = self.postings(term)
+            if postings is not None:
+                df, docs, tfs = postings
+                lists.append((docs, tfs, self._weights(df, scoring)))
+        # One cursor per term, ordered by the doc id it is on.
+        cursors = [(docs[0], i, 0) for i, (docs, _, _) in enumerate(lists)]
+        cursors.sort()
+        top = list()  # min-heap of (score, -doc id)
+        while cursors:
+            doc = cursors[0][0]
+            score = 0.0
+            while cursors and cursors[0][0] == doc:
+                _, i, pos = cursors[0]
+                docs, tfs, weight = lists[i]
+                score += weight(doc, tfs[pos])
+                pos += 1
+                if pos < len(docs):
+                    heapreplace(cursors, (docs[pos], i, pos))
+                else:
+                    heappop(cursors)
+            if len(top) < k:
+                heappush(top, (score, -doc))
+            elif score > top[0][0]:
+                heapreplace(top, (score, -doc))
+        return [(self.url(-doc), score) for score, doc in sorted(top, reverse=True)]
+
+    def close(self):
+        for mapped in (self.lexicon, self.terms, self.postings_file,
+                       self.doc_table, self.urls):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+if __name__ == "__main__":
+    import time
+    from argparse import ArgumentParser
+    from scraper import stop_words
+
+    parser = ArgumentParser()
+    parser.add_argument("index_dir")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--scoring", choices=("bm25", "tfidf"), default="bm25")
+    args = parser.parse_args()
+    engine = SearchEngine(args.index_dir, stop_words)
+    print(f"{engine.docs} documents, {engine.term_count} terms. One query per line.")
+    try:
+        while True:
+            query = input("> ")
+            start = time.perf_counter()
+            results = engine.search(query, args.k, args.scoring)
+            elapsed = (time.perf_counter() - start) * 1000
+            for url, score in results:
+                print(f"{score:8.3f}  {url}")
+            print(f"{len(results)} results in {elapsed:.1f} ms")
+    except (EOFError, KeyboardInterrupt):
+        engine.close()
@@ -0,0 +1,182 @@
+import heapq
+import os
+import pickle
+import sys
+from collections import Counter
+from threading import Lock, Thread, Event, local
+from urllib.parse import urlsplit
+
+
+class StatsShard(object):
+    ''' Crawl statistics accumulated by a single thread.
+
+    Only its owner thread and the aggregator touch a shard, so its lock is
+    almost never contended. '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.pages = 0
+        self.longest = (0, "")
+
+    def record_page(self, url, counts, word_count):
+        with self.lock:
+            self.words.update(counts)
+            self.subdomains[urlsplit(url).netloc] += 1
+            self.pages += 1
+            if word_count > self.longest[0]:
+                self.longest = (word_count, url)
+
+    def drain(self):
+        ''' Hand over everything recorded since the last drain. '''
+        with self.lock:
+            delta = (self.words, self.subdomains, self.pages, self.longest)
+            self._reset()
+        return delta
+
+
+class CrawlStats(object):
+    ''' Word, page and subdomain statistics for the whole crawl.
+
+    Each thread records into its own StatsShard; a background thread merges
+    the shards into one view every `merge_interval` seconds, and merge()
+    can be called to bring the view up to date before reading it.
+
+    checkpoint() appends what changed since the previous checkpoint to a
+    snapshot file of pickled records, rewriting it as a single record every
+    `compact_every` appends; load() sums the records back up exactly. '''
+
+    def __init__(self, merge_interval=5.0, compact_every=100):
+        self.merge_interval = merge_interval
+        self.compact_every = compact_every
+        self.appended = 0
+        self.local = local()
+        self.shards = list()
+        self.lock = Lock()
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.pages = 0
+        self.longest = (0, "")
+        self.unsaved = self._record()
+        self.stopped = Event()
+        self.aggregator = None
+
+    def shard(self):
+        ''' The calling thread's shard, created on first use. '''
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = StatsShard()
+            with self.lock:
+                self.shards.append(shard)
+                if self.aggregator is None:
+                    self.aggregator = Thread(target=self._merge_periodically, daemon=True)
+                    self.aggregator.start()
+        return shard
+
+    def record_page(self, url, counts, word_count):
+        self.shard().record_page(url, counts, word_count)
+
+    @staticmethod
+    def _record(words=None, subdomains=None, pages=0, longest=(0, "")):
+        return {
+            "words": Counter(words or {}), "subdomains": Counter(subdomains or {}),
+            "pages": pages, "longest": tuple(longest)}
+
+    def _apply(self, words, subdomains, pages, longest):
+        self.words.update(words)
+        self.subdomains.update(subdomains)
+        self.pages += pages
+        self.longest = max(self.longest, tuple(longest))
+
+    def merge(self):
+        with self.lock:
+            for shard in self.shards:
+                words, subdomains, pages, longest = shard.drain()
+                self._apply(words, subdomains, pages, longest)
+                unsaved = self.unsaved
+                unsaved["words"].update(words)
+                unsaved["subdomains"].update(subdomains)
+                unsaved["pages"] += pages
+                unsaved["longest"] = max(unsaved["longest"], longest)
+
+    def checkpoint(self, path):
+        ''' Persist everything merged so far to the snapshot at `path`. '''
+        self.merge()
+        with self.lock:
+            if self.appended >= self.compact_every or not os.path.exists(path):
+                record = self._record(
+                    self.words, self.subdomains, self.pages, self.longest)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                self.appended = 0
+            else:
+                with open(path, "ab") as f:
+                    pickle.dump(self.unsaved, f, pickle.HIGHEST_PROTOCOL)
+                self.appended += 1
+            self.unsaved = self._record()
+
+    def load(self, path):
+        ''' Add the statistics saved in the snapshot at `path`, if any. A
+        record torn by a crash ends the replay and is cut off the file, so
+        later checkpoints append after the last good record. '''
+        if not os.path.exists(path):
+            return
+        with self.lock, open(path, "r+b") as f:
+            good = 0
+            while True:
+                try:
+                    record = pickle.load(f)
+                except Exception:
+                    break
+                self._apply(record["words"], record["subdomains"],
+                            record["pages"], record["longest"])
+                self.appended += 1
+                good = f.tell()
+            if good < os.fstat(f.fileno()).st_size:
+                f.truncate(good)
+
+    def _merge_periodically(self):
+        while not self.stopped.wait(self.merge_interval):
+            self.merge()
+
+    def top_words(self, n):
+        with self.lock:
+            return heapq.nlargest(n, self.words.items(), key=lambda item: item[1])
+
+    def longest_page(self):
+        ''' (url, word count) of the longest page seen. '''
+        with self.lock:
+            return self.longest[1], self.longest[0]
+
+    def subdomain_counts(self, suffix=""):
+        with self.lock:
+            return {host: count for host, count in self.subdomains.items()
+                    if host.endswith(suffix)}
+
+    def unique_pages(self):
+        with self.lock:
+            return self.pages
+
+    def report(self, top=50, suffix=".ics.uci.edu"):
+        ''' Human readable summary of the merged view. '''
+        longest_page_url, longest_page_word_count = self.longest_page()
+        lines = [
+            f"Unique pages: {self.unique_pages()}",
+            f"Longest page so far: {longest_page_url} with word count: {longest_page_word_count}",
+            f"Top {top} words: {dict(self.top_words(top))}"]
+        for subdomain, count in sorted(self.subdomain_counts(suffix).items()):
+            lines.append(f"{subdomain}, {count}")
+        return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    # python -m utils.stats stats.snapshot
+    stats = CrawlStats()
+    stats.load(sys.argv[1] if len(sys.argv) > 1 else "stats.snapshot")
+    print(stats.report(), end="")
@@ -0,0 +1,110 @@
+import re
+from array import array
+from collections import Counter
+from hashlib import blake2b
+from threading import Lock
+from urllib.parse import urlsplit
+
+DIGITS_RE = re.compile(r"\d+")
+# Path segments that look like generated ids: uuids, long hex strings and
+# long mixes of letters and digits (session ids, hashes).
+ID_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|[0-9a-f]{8,}"
+    r"|(?=[a-z_-]*\d)(?=[\d_-]*[a-z])[a-z\d_-]{12,}", re.IGNORECASE)
+
+
+def url_template(url):
+    ''' host, path and query keys of url with ids and digits collapsed, e.g.
+    /event/2019-12/a3f9c2d1e5?day=3&view=list -> /event/#-#/*?day&view '''
+    parsed = urlsplit(url)
+    segments = ("*" if ID_RE.fullmatch(segment) else DIGITS_RE.sub("#", segment)
+                for segment in parsed.path.split("/"))
+    template = f"{parsed.netloc}{'/'.join(segments)}"
+    if parsed.query:
+        keys = sorted({pair.split("=", 1)[0] for pair in parsed.query.split("&")})
+        template += "?" + "&".join(keys)
+    return template
+
+
+class CountMinSketch(object):
+    ''' Approximate counts of keys in `depth` rows of `width` counters.
+
+    Estimates never undercount and overcount by little while the total count
+    is small next to width. Counts are updated conservatively: only the rows
+    holding the current minimum are raised. '''
+
+    def __init__(self, width=1 << 16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, key):
+        digest = blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        ''' Count key and return its new estimate. '''
+        indexes = self._indexes(key)
+        estimate = min(row[i] for row, i in zip(self.rows, indexes)) + count
+        for row, i in zip(self.rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+        return estimate
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def decay(self):
+        ''' Halve every count. '''
+        for n, row in enumerate(self.rows):
+            self.rows[n] = array("I", (count >> 1 for count in row))
+
+    def memory_bytes(self):
+        return self.depth * self.width * 4
+
+
+class TrapDetector(object):
+    ''' Cuts off url patterns that keep producing new urls.
+
+    Every url let through is counted against its url_template in a
+    Count-Min sketch; once a template has been seen more than its host's
+    budget (`host_budgets` overriding `budget` per host), further urls
+    matching it are rejected. All counts are halved every `decay_every`
+    urls, so a pattern only stays cut off while it keeps growing faster
+    than its budget. Memory is fixed: the sketch, plus the `max_reported`
+    most rejected templates kept for report(). Thread safe. '''
+
+    def __init__(self, budget=50, host_budgets=None, decay_every=100000,
+                 width=1 << 16, depth=4, max_reported=1000):
+        self.budget = budget
+        self.host_budgets = host_budgets or dict()
+        self.decay_every = decay_every
+        self.sketch = CountMinSketch(width, depth)
+        self.max_reported = max_reported
+        self.rejected = Counter()  # template -> urls rejected
+        self.added = 0
+        self.lock = Lock()
+
+    def allow(self, url):
+        ''' Whether url may be queued; counts it if so. '''
+        template = url_template(url)
+        budget = self.host_budgets.get(urlsplit(url).netloc, self.budget)
+        with self.lock:
+            if self.sketch.estimate(template) >= budget:
+                self.rejected[template] += 1
+                if len(self.rejected) > 2 * self.max_reported:
+                    self.rejected = Counter(dict(self.rejected.most_common(self.max_reported)))
+                return False
+            self.sketch.add(template)
+            self.added += 1
+            if self.added % self.decay_every == 0:
+                self.sketch.decay()
+            return True
+
+    def report(self, n=20):
+        ''' The n templates with the most urls rejected, with their counts. '''
+        with self.lock:
+            return self.rejected.most_common(n)
@@ -0,0 +1,112 @@
+import re
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlsplit
+
+# Reason codes returned for each url.
+ACCEPT = "accept"
+PARSE_ERROR = "parse_error"        # 606
+BAD_SCHEME = "bad_scheme"          # 603
+BAD_DOMAIN = "bad_domain"          # 604
+BAD_SUBDOMAIN = "bad_subdomain"    # 604
+BAD_TODAY_PATH = "bad_today_path"  # 604
+BAD_EXTENSION = "bad_extension"    # 605
+REPEATING_PATH = "repeating_path"
+TOO_DEEP = "too_deep"
+DATE_PATH = "date_path"
+QUERY_LIMIT = "query_limit"
+VISITED = "visited"
+
+SCHEMES = frozenset(["http", "https"])
+DOMAIN = "uci.edu"
+SUBDOMAINS = frozenset(["ics", "cs", "informatics", "stat"])
+TODAY_HOST = "today.uci.edu"
+TODAY_PATH = "/department/information_computer_sciences/"
+EXTENSIONS = frozenset("""
+    css js bmp gif jpg jpeg ico png tif tiff mid mp2 mp3 mp4
+    wav avi mov mpeg ram m4v mkv ogg ogv pdf
+    ps eps tex ppt pptx doc docx xls xlsx names
+    data dat exe bz2 tar msi bin 7z psd dmg iso
+    epub dll cnf tgz sha1
+    thmx mso arff rtf jar csv
+    rm smil wmv swf wma zip rar gz""".split())
+MAX_SEGMENTS = 5
+MAX_QUERY_MARKS = 3
+DATE_RE = re.compile(r"\d{4}-\d{2}")
+
+
+def is_repeating_path(path):
+    segments = path.strip("/").split('/')
+    # Check for a repeating pattern where a segment is followed by itself
+    for i in range(len(segments) - 1):
+        if segments[i] == segments[i + 1]:
+            return True
+    # If a segment occurs 3 or more times, it's likely a trap
+    segment_counts = Counter(segments)
+    return max(segment_counts.values()) >= 3
+
+
+class UrlFilter(object):
+    ''' Rule pipeline deciding whether a url should be crawled.
+
+    All rules are built once; check() runs them in order and returns the
+    reason code of the first that rejects, or ACCEPT. Counts per reason are
+    kept in `counts` instead of being printed. '''
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = Lock()
+
+    def _check(self, url, seen):
+        try:
+            parsed = urlsplit(url)
+        except ValueError:
+            return PARSE_ERROR
+        if parsed.scheme not in SCHEMES:
+            return BAD_SCHEME
+
+        netloc = parsed.netloc
+        path = parsed.path
+        if netloc == TODAY_HOST:
+            if not path.startswith(TODAY_PATH):
+                return BAD_TODAY_PATH
+            # Accepted without the path rules below, as is_valid always did;
+            # only urls already seen are dropped.
+            if seen is not None and url in seen:
+                return VISITED
+            return ACCEPT
+        else:
+            netloc_parts = netloc.split('.')
+            if len(netloc_parts) < 2 or ".".join(netloc_parts[-2:]) != DOMAIN:
+                return BAD_DOMAIN
+            if len(netloc_parts) > 2 and netloc_parts[-3] not in SUBDOMAINS:
+                return BAD_SUBDOMAIN
+
+        dot = path.rfind(".")
+        if dot != -1 and path[dot + 1:].lower() in EXTENSIONS:
+            return BAD_EXTENSION
+        if is_repeating_path(path):
+            return REPEATING_PATH
+        if path.count("/") >= MAX_SEGMENTS:
+            return TOO_DEEP
+        if DATE_RE.search(url):
+            return DATE_PATH
+        query = parsed.query
+        if (query.count("%") >= MAX_QUERY_MARKS
+                or query.count("=") >= MAX_QUERY_MARKS
+                or query.count("&") >= MAX_QUERY_MARKS):
+            return QUERY_LIMIT
+        if seen is not None and url in seen:
+            return VISITED
+        return ACCEPT
+
+    def check(self, url, seen=None):
+        return self.check_many([url], seen)[0]
+
+    def check_many(self, urls, seen=None):
+        ''' Reason code for each url, in order. Urls in the optional `seen`
+        container are rejected as VISITED. '''
+        reasons = [self._check(url, seen) for url in urls]
+        with self.lock:
+            self.counts.update(reasons)
+        return reasons